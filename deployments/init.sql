@@ -72,12 +72,16 @@ CREATE INDEX IF NOT EXISTS idx_documents_metadata ON documents USING GIN(metadat
 
 -- 文档块索引
 CREATE INDEX IF NOT EXISTS idx_document_chunks_document_id ON document_chunks(document_id);
-CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding ON document_chunks USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+-- HNSW向量索引：把O(N)余弦全表扫描变成近似最近邻查找，
+-- 查询端通过 SET LOCAL hnsw.ef_search 控制召回/延迟
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding ON document_chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 
 -- 查询历史索引
 CREATE INDEX IF NOT EXISTS idx_query_history_user_id ON query_history(user_id);
 CREATE INDEX IF NOT EXISTS idx_query_history_session_id ON query_history(session_id);
 CREATE INDEX IF NOT EXISTS idx_query_history_created_at ON query_history(created_at);
+-- 三元组索引：搜索建议按相似度匹配历史查询时走索引扫描而非全表扫描
+CREATE INDEX IF NOT EXISTS idx_query_history_query_text_trgm ON query_history USING gin (query_text gin_trgm_ops);
 CREATE INDEX IF NOT EXISTS idx_query_history_embedding ON query_history USING ivfflat (query_embedding vector_cosine_ops) WITH (lists = 100);
 
 -- 创建更新时间戳的触发器函数
@@ -1,6 +1,7 @@
 """生产级FastAPI应用程序"""
 import asyncio
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 from typing import Dict, Any, List
 
 from fastapi import FastAPI, HTTPException, Depends, Request
@@ -162,7 +163,7 @@ async def process_query(
         # 处理查询
         response = await service.process_query(mcp_request)
         
-        return QueryResponseModel(**response.__dict__)
+        return QueryResponseModel(**asdict(response))
         
     except Exception as e:
         logger.error("查询处理失败", error=str(e))
@@ -60,8 +60,8 @@ class PostgreSQLSettings(BaseSettings):
     user: str = Field(default="mcp_user", env="POSTGRES_USER")
     password: str = Field(env="POSTGRES_PASSWORD")
     max_connections: int = Field(default=20, env="POSTGRES_MAX_CONNECTIONS")
-    pool_size: int = Field(default=10, env="POSTGRES_POOL_SIZE")
-    max_overflow: int = Field(default=20, env="POSTGRES_MAX_OVERFLOW")
+    pool_size: int = Field(default=20, env="POSTGRES_POOL_SIZE")
+    max_overflow: int = Field(default=10, env="POSTGRES_MAX_OVERFLOW")
     pool_timeout: int = Field(default=30, env="POSTGRES_POOL_TIMEOUT")
     pool_recycle: int = Field(default=3600, env="POSTGRES_POOL_RECYCLE")
     
@@ -84,6 +84,7 @@ class RAGSettings(BaseSettings):
     # 搜索配置
     similarity_threshold: float = Field(default=0.7, env="RAG_SIMILARITY_THRESHOLD")
     max_search_results: int = Field(default=10, env="RAG_MAX_SEARCH_RESULTS")
+    rrf_k: int = Field(default=60, env="RAG_RRF_K")  # 混合搜索RRF融合常数
     
     # 缓存配置
     enable_cache: bool = Field(default=True, env="RAG_ENABLE_CACHE")
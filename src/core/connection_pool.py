@@ -10,8 +10,8 @@ from enum import Enum
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
-from tenacity import retry, stop_after_attempt, wait_exponential
-from circuitbreaker import circuit
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+from circuitbreaker import circuit, CircuitBreakerError
 
 from src.config.settings import settings
 from src.utils.logging import get_structured_logger
@@ -60,6 +60,9 @@ class MCPConnectionPool:
         self.server_configs: Dict[str, ServerConfig] = {}
         self._lock = asyncio.Lock()
         self._health_check_task: Optional[asyncio.Task] = None
+        # 工具索引：仅在连接建立/清理时重建，请求路径直接读取
+        self._flat_tools: List[Dict[str, Any]] = []
+        self._tools_by_name: Dict[str, Dict[str, Any]] = {}
         self._metrics = {
             'total_connections': 0,
             'active_connections': 0,
@@ -136,7 +139,10 @@ class MCPConnectionPool:
     
     @retry(
         stop=stop_after_attempt(settings.mcp.max_reconnect_attempts),
-        wait=wait_exponential(multiplier=1, min=1, max=10)
+        wait=wait_exponential(multiplier=1, min=1, max=10),
+        # 断路器打开意味着服务器在冷却期内注定失败，
+        # 对CircuitBreakerError做指数退避重试只是白等
+        retry=retry_if_not_exception_type(CircuitBreakerError)
     )
     @circuit(failure_threshold=5, recovery_timeout=30, expected_exception=Exception)
     async def _create_connection(self, server_name: str) -> Optional[ConnectionInfo]:
@@ -277,6 +283,7 @@ class MCPConnectionPool:
                     if server_name not in self.pools:
                         self.pools[server_name] = []
                     self.pools[server_name].append(connection)
+                    self._rebuild_tool_index()
                     return connection
             
             logger.warning("无法获取连接", server=server_name)
@@ -321,7 +328,30 @@ class MCPConnectionPool:
                         await self._cleanup_connection(connection)
                 
                 self.pools[server_name] = healthy_connections
-        
+
+            self._rebuild_tool_index()
+
+        # 为配置中存在但池已空的服务器尝试重连：启动时就不可用的
+        # 服务器由此自动恢复上线，不必等进程重启。重连放在锁外——
+        # 连接超时和重试退避可达数秒，不能让请求路径上的
+        # get_connection跟着陪等；拿到连接后再短暂加锁登记
+        for server_name in self.server_configs:
+            if self.pools.get(server_name):
+                continue
+            try:
+                connection = await self._create_connection(server_name)
+            except CircuitBreakerError:
+                # 断路器仍在冷却期：本轮静默跳过，等下个周期半开探测
+                continue
+            except Exception as e:
+                logger.warning("服务器重连失败", server=server_name, error=str(e))
+                continue
+            if connection:
+                async with self._lock:
+                    self.pools.setdefault(server_name, []).append(connection)
+                    self._rebuild_tool_index()
+                logger.info("服务器重连成功", server=server_name)
+
         logger.debug("健康检查完成", active_connections=self._metrics['active_connections'])
     
     async def _cleanup_connection(self, connection: ConnectionInfo) -> None:
@@ -333,16 +363,49 @@ class MCPConnectionPool:
         except Exception as e:
             logger.error("清理连接失败", error=str(e))
     
+    def _rebuild_tool_index(self) -> None:
+        """重建工具索引（pools变更时调用，调用方需持有锁）"""
+        flat_tools: List[Dict[str, Any]] = []
+        tools_by_name: Dict[str, Dict[str, Any]] = {}
+
+        for server_name, pool in self.pools.items():
+            for connection in pool:
+                if connection.tools_cache:
+                    for tool in connection.tools_cache:
+                        name = tool["function"]["name"]
+                        if name not in tools_by_name:
+                            tools_by_name[name] = tool
+                            flat_tools.append(tool)
+                    # 同一服务器的连接共享工具列表，取第一个即可
+                    break
+
+        self._flat_tools = flat_tools
+        self._tools_by_name = tools_by_name
+
+    @property
+    def flat_tools(self) -> List[Dict[str, Any]]:
+        """所有已连接服务器的工具列表（只读视图）"""
+        return self._flat_tools
+
+    @property
+    def tools_by_name(self) -> Dict[str, Dict[str, Any]]:
+        """按名称索引的工具表（只读视图）"""
+        return self._tools_by_name
+
     async def get_all_tools(self) -> List[Dict[str, Any]]:
         """获取所有工具"""
-        all_tools = []
-        
+        # 按服务器检查在线状态而非只看索引是否全空：个别服务器
+        # 掉线时其余服务器的工具仍在索引里，也要给掉线者补连的
+        # 机会；失败由断路器快速短路，不阻塞其他服务器的工具
         for server_name in self.server_configs:
-            connection = await self.get_connection(server_name)
-            if connection and connection.tools_cache:
-                all_tools.extend(connection.tools_cache)
-        
-        return all_tools
+            if self.pools.get(server_name):
+                continue
+            try:
+                await self.get_connection(server_name)
+            except Exception as e:
+                logger.warning("连接服务器失败", server=server_name, error=str(e))
+
+        return self._flat_tools
     
     def get_metrics(self) -> Dict[str, Any]:
         """获取连接池指标"""
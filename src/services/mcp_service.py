@@ -1,6 +1,7 @@
 """生产级MCP服务"""
 import json
 import asyncio
+import time
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from openai import AsyncOpenAI
@@ -12,7 +13,7 @@ from src.utils.logging import get_structured_logger
 logger = get_structured_logger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class QueryRequest:
     """查询请求"""
     query: str
@@ -22,7 +23,7 @@ class QueryRequest:
     timeout: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class QueryResponse:
     """查询响应"""
     content: str
@@ -42,6 +43,12 @@ class MCPService:
         self._request_counter = 0
         self._concurrent_requests = 0
         self._max_concurrent = settings.api.max_concurrent_requests
+        # OpenAI探活结果缓存: (检查时间, 状态)
+        self._openai_probe: tuple = (0.0, "unknown")
+        self._openai_probe_ttl = 10  # 秒
+        # 后台日志队列，避免在请求协程内同步序列化结构化日志
+        self._log_queue: asyncio.Queue = asyncio.Queue(maxsize=1000)
+        self._log_worker_task: Optional[asyncio.Task] = None
     
     async def initialize(self) -> None:
         """初始化服务"""
@@ -56,24 +63,57 @@ class MCPService:
         
         # 初始化连接池
         await self.connection_pool.initialize()
-        
+
+        # 启动后台日志消费任务
+        self._log_worker_task = asyncio.create_task(self._log_worker())
+
         logger.info("MCP服务初始化完成")
+
+    def _log_async(self, level: str, event: str, **kwargs) -> None:
+        """将热路径日志写入后台队列，由_log_worker统一输出"""
+        try:
+            self._log_queue.put_nowait((level, event, kwargs))
+        except asyncio.QueueFull:
+            logger.warning("日志队列已满，丢弃日志", event=event)
+
+    async def _log_worker(self) -> None:
+        """后台日志消费循环"""
+        while True:
+            try:
+                level, event, kwargs = await self._log_queue.get()
+                getattr(logger, level)(event, **kwargs)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("后台日志输出失败", error=str(e))
     
+    @staticmethod
+    def _finalize(response: QueryResponse, start: float, request_id: str) -> QueryResponse:
+        """统一设置响应的执行时间和请求ID"""
+        response.execution_time = time.monotonic() - start
+        response.request_id = request_id
+        return response
+
     async def process_query(self, request: QueryRequest) -> QueryResponse:
         """处理查询请求"""
-        import time
-        start_time = time.time()
-        
+        start = time.monotonic()
+
         # 并发控制
         if self._concurrent_requests >= self._max_concurrent:
             raise Exception(f"超过最大并发请求数限制: {self._max_concurrent}")
-        
+
         self._concurrent_requests += 1
         self._request_counter += 1
-        request_id = f"req_{self._request_counter}_{start_time}"
+        request_id = f"req_{self._request_counter}_{time.time()}"
+
+        # 将热路径上重复访问的配置项绑定到局部变量
+        model = settings.openai.model
+        max_tokens = request.max_tokens or settings.openai.max_tokens
+        timeout = request.timeout or settings.openai.timeout
         
         try:
-            logger.info(
+            self._log_async(
+                "info",
                 "开始处理查询",
                 request_id=request_id,
                 user_id=request.user_id,
@@ -92,41 +132,41 @@ class MCPService:
                 # 包含RAG上下文的消息
                 context_message = f"基于知识库搜索到的相关信息:\n{rag_context}\n\n用户问题: {request.query}"
                 messages = [{"role": "user", "content": context_message}]
-                logger.info("使用RAG上下文增强查询", context_length=len(rag_context))
+                self._log_async("info", "使用RAG上下文增强查询", context_length=len(rag_context))
             else:
                 messages = [{"role": "user", "content": request.query}]
             
-            # 获取所有可用工具
-            available_tools = await self.connection_pool.get_all_tools()
+            # 获取所有可用工具（索引已建立时为纯属性读取）
+            available_tools = self.connection_pool.flat_tools or \
+                await self.connection_pool.get_all_tools()
             if not available_tools:
-                return QueryResponse(
+                return self._finalize(QueryResponse(
                     content="错误: 没有可用的工具",
                     tools_used=[],
-                    execution_time=time.time() - start_time,
+                    execution_time=0,
                     request_id=request_id,
                     status="error",
                     error="no_tools_available"
-                )
+                ), start, request_id)
             
             # 调用OpenAI API
-            max_tokens = request.max_tokens or settings.openai.max_tokens
             completion = await self.openai_client.chat.completions.create(
-                model=settings.openai.model,
+                model=model,
                 max_tokens=max_tokens,
                 messages=messages,
                 tools=available_tools,
-                timeout=request.timeout or settings.openai.timeout
+                timeout=timeout
             )
             
             # 处理响应
             response = await self._process_completion_response(
                 completion, messages, available_tools, request_id
             )
-            
-            response.execution_time = time.time() - start_time
-            response.request_id = request_id
-            
-            logger.info(
+
+            self._finalize(response, start, request_id)
+
+            self._log_async(
+                "info",
                 "查询处理完成",
                 request_id=request_id,
                 execution_time=response.execution_time,
@@ -140,16 +180,16 @@ class MCPService:
                 "查询处理失败",
                 request_id=request_id,
                 error=str(e),
-                execution_time=time.time() - start_time
+                execution_time=time.monotonic() - start
             )
-            return QueryResponse(
+            return self._finalize(QueryResponse(
                 content=f"处理查询时发生错误: {str(e)}",
                 tools_used=[],
-                execution_time=time.time() - start_time,
+                execution_time=0,
                 request_id=request_id,
                 status="error",
                 error=str(e)
-            )
+            ), start, request_id)
         finally:
             self._concurrent_requests -= 1
     
@@ -179,13 +219,9 @@ class MCPService:
                     tool_args=tool_args
                 )
                 
-                # 找到对应的工具和服务器
-                tool_info = None
-                for tool in available_tools:
-                    if tool["function"]["name"] == tool_name:
-                        tool_info = tool
-                        break
-                
+                # 通过连接池的工具索引定位工具和服务器
+                tool_info = self.connection_pool.tools_by_name.get(tool_name)
+
                 if tool_info:
                     server_name = tool_info["server_name"]
                     original_name = tool_info["original_name"]
@@ -306,16 +342,13 @@ class MCPService:
                     search_data = json.loads(result.content[0].text) if result.content[0].text else {}
                     
                     if search_data.get("success") and search_data.get("results"):
-                        # 构建上下文字符串
-                        context_parts = []
-                        for result_item in search_data["results"][:3]:  # 最多3个结果
-                            title = result_item.get("document_title", "未知文档")
-                            content = result_item.get("content", "")[:500]  # 截断过长内容
-                            score = result_item.get("similarity_score", 0)
-                            
-                            context_parts.append(f"文档: {title} (相似度: {score:.2f})\n内容: {content}")
-                        
-                        return "\n\n".join(context_parts)
+                        # 构建上下文字符串（最多3个结果，内容截断500字符）
+                        return "\n\n".join(
+                            f"文档: {r.get('document_title', '未知文档')} "
+                            f"(相似度: {r.get('similarity_score', 0):.2f})\n"
+                            f"内容: {r.get('content', '')[:500]}"
+                            for r in search_data["results"][:3]
+                        )
                 
                 return None
                 
@@ -341,25 +374,43 @@ class MCPService:
             "total_requests": self._request_counter
         }
     
-    async def health_check(self) -> Dict[str, Any]:
-        """健康检查"""
+    async def _check_openai(self, deep: bool = False) -> str:
+        """检查OpenAI连接
+
+        默认使用轻量的模型元数据接口探活（不消耗补全额度），
+        并在TTL内复用结果；deep=True时才执行真实的补全调用。
+        """
+        now = time.monotonic()
+        if not deep and now - self._openai_probe[0] < self._openai_probe_ttl:
+            return self._openai_probe[1]
+
         try:
-            # 检查连接池状态
-            metrics = self.connection_pool.get_metrics()
-            
-            # 检查OpenAI连接
-            openai_status = "healthy"
-            try:
-                # 简单的API测试
-                test_messages = [{"role": "user", "content": "test"}]
+            if deep:
+                # 深度检查：执行真实的补全调用
                 await self.openai_client.chat.completions.create(
                     model=settings.openai.model,
                     max_tokens=1,
-                    messages=test_messages
+                    messages=[{"role": "user", "content": "test"}]
                 )
-            except Exception as e:
-                openai_status = f"unhealthy: {str(e)}"
-            
+            else:
+                # 轻量检查：只查询模型元数据
+                await self.openai_client.models.retrieve(settings.openai.model)
+            status = "healthy"
+        except Exception as e:
+            status = f"unhealthy: {str(e)}"
+
+        self._openai_probe = (now, status)
+        return status
+
+    async def health_check(self, deep: bool = False) -> Dict[str, Any]:
+        """健康检查"""
+        try:
+            # 检查连接池状态
+            metrics = self.connection_pool.get_metrics()
+
+            # 检查OpenAI连接
+            openai_status = await self._check_openai(deep=deep)
+
             return {
                 "status": "healthy" if metrics["active_connections"] > 0 else "unhealthy",
                 "connection_pool": metrics,
@@ -376,5 +427,11 @@ class MCPService:
     async def shutdown(self) -> None:
         """关闭服务"""
         logger.info("关闭MCP服务")
+        if self._log_worker_task:
+            self._log_worker_task.cancel()
+            try:
+                await self._log_worker_task
+            except asyncio.CancelledError:
+                pass
         await self.connection_pool.shutdown()
         logger.info("MCP服务关闭完成")
\ No newline at end of file
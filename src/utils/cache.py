@@ -1,11 +1,14 @@
 """缓存系统"""
 import asyncio
-import json
+import heapq
+import importlib
 import time
 from typing import Any, Dict, Optional, Union
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
+import numpy as np
+import orjson
 import redis.asyncio as redis
 from src.config.settings import settings
 from src.utils.logging import get_structured_logger
@@ -39,110 +42,166 @@ class CacheBackend(ABC):
     async def delete(self, key: str) -> bool:
         """删除缓存"""
         pass
-    
+
+    @abstractmethod
+    async def delete_many(self, keys: list) -> int:
+        """批量删除缓存，返回删除数量"""
+        pass
+
     @abstractmethod
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
         pass
-    
+
     @abstractmethod
     async def clear(self) -> bool:
         """清空缓存"""
         pass
 
+    @abstractmethod
+    async def ping(self) -> bool:
+        """轻量存活探测"""
+        pass
+
 
 class MemoryCache(CacheBackend):
-    """内存缓存"""
-    
+    """内存缓存
+
+    缓存按键哈希分成32个分片，每个分片有独立的锁，
+    避免所有读写在单个全局锁上串行化。
+    """
+
+    _SHARD_COUNT = 32  # 2的幂，便于位掩码取分片
+
     def __init__(self):
-        self._cache: Dict[str, CacheEntry] = {}
-        self._lock = asyncio.Lock()
+        self._shards: list = [{} for _ in range(self._SHARD_COUNT)]
+        self._locks: list = [asyncio.Lock() for _ in range(self._SHARD_COUNT)]
+        self._mask = self._SHARD_COUNT - 1
+        # (过期时间, 分片索引, 键) 最小堆，清理时只看堆顶而非全量扫描
+        self._expiry_heap: list = []
         self._cleanup_task: Optional[asyncio.Task] = None
         self._start_cleanup()
-    
+
+    def _shard_index(self, key: str) -> int:
+        return hash(key) & self._mask
+
+    @staticmethod
+    def _is_expired(entry: CacheEntry) -> bool:
+        return time.time() - entry.timestamp > entry.ttl
+
     def _start_cleanup(self):
         """启动清理任务"""
         self._cleanup_task = asyncio.create_task(self._cleanup_expired())
-    
+
     async def _cleanup_expired(self):
-        """清理过期缓存"""
+        """清理过期缓存
+
+        按最小堆的过期时间顺序弹出到期条目，每轮只处理确实到期的
+        键，不再对整个缓存做O(N)扫描。键被覆盖写入后堆中会残留旧
+        记录，弹出时与分片中的实际条目核对即可安全跳过。
+        """
         while True:
             try:
                 await asyncio.sleep(60)  # 每分钟清理一次
                 current_time = time.time()
-                
-                async with self._lock:
-                    expired_keys = []
-                    for key, entry in self._cache.items():
-                        if current_time - entry.timestamp > entry.ttl:
-                            expired_keys.append(key)
-                    
-                    for key in expired_keys:
-                        del self._cache[key]
-                    
-                    if expired_keys:
-                        logger.debug("清理过期缓存", count=len(expired_keys))
-                        
+                expired_count = 0
+
+                while self._expiry_heap and self._expiry_heap[0][0] <= current_time:
+                    _, i, key = heapq.heappop(self._expiry_heap)
+                    async with self._locks[i]:
+                        entry = self._shards[i].get(key)
+                        if entry and self._is_expired(entry):
+                            del self._shards[i][key]
+                            expired_count += 1
+
+                if expired_count:
+                    logger.debug("清理过期缓存", count=expired_count)
+
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error("缓存清理失败", error=str(e))
-    
+
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存"""
-        async with self._lock:
-            entry = self._cache.get(key)
-            if not entry:
-                return None
-            
-            # 检查是否过期
-            if time.time() - entry.timestamp > entry.ttl:
-                del self._cache[key]
-                return None
-            
-            return entry.value
-    
+        i = self._shard_index(key)
+        # 乐观无锁读：CPython字典读取本身是原子的，只有删除过期条目时才加锁
+        entry = self._shards[i].get(key)
+        if not entry:
+            return None
+
+        # 检查是否过期
+        if self._is_expired(entry):
+            async with self._locks[i]:
+                if self._shards[i].get(key) is entry:
+                    del self._shards[i][key]
+            return None
+
+        return entry.value
+
     async def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
         """设置缓存"""
         try:
-            async with self._lock:
-                self._cache[key] = CacheEntry(
+            i = self._shard_index(key)
+            now = time.time()
+            async with self._locks[i]:
+                self._shards[i][key] = CacheEntry(
                     value=value,
-                    timestamp=time.time(),
+                    timestamp=now,
                     ttl=ttl,
                     key=key
                 )
+            heapq.heappush(self._expiry_heap, (now + ttl, i, key))
             return True
         except Exception as e:
             logger.error("设置缓存失败", key=key, error=str(e))
             return False
-    
+
     async def delete(self, key: str) -> bool:
         """删除缓存"""
         try:
-            async with self._lock:
-                if key in self._cache:
-                    del self._cache[key]
+            i = self._shard_index(key)
+            async with self._locks[i]:
+                if key in self._shards[i]:
+                    del self._shards[i][key]
                     return True
                 return False
         except Exception as e:
             logger.error("删除缓存失败", key=key, error=str(e))
             return False
-    
+
+    async def delete_many(self, keys: list) -> int:
+        """批量删除缓存"""
+        deleted = 0
+        try:
+            for key in keys:
+                if await self.delete(key):
+                    deleted += 1
+        except Exception as e:
+            logger.error("批量删除缓存失败", error=str(e))
+        return deleted
+
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
-        return await self.get(key) is not None
-    
+        entry = self._shards[self._shard_index(key)].get(key)
+        return entry is not None and not self._is_expired(entry)
+
     async def clear(self) -> bool:
         """清空缓存"""
         try:
-            async with self._lock:
-                self._cache.clear()
+            for i in range(self._SHARD_COUNT):
+                async with self._locks[i]:
+                    self._shards[i].clear()
+            self._expiry_heap.clear()
             return True
         except Exception as e:
             logger.error("清空缓存失败", error=str(e))
             return False
-    
+
+    async def ping(self) -> bool:
+        """轻量存活探测（进程内缓存恒为存活）"""
+        return True
+
     async def shutdown(self):
         """关闭缓存"""
         if self._cleanup_task:
@@ -159,10 +218,18 @@ class RedisCache(CacheBackend):
     def __init__(self):
         self._redis: Optional[redis.Redis] = None
         self._connected = False
-    
+        self._init_lock = asyncio.Lock()
+
     async def _ensure_connected(self):
         """确保Redis连接"""
-        if not self._connected:
+        # 快速路径：已连接时不加锁直接返回
+        if self._connected:
+            return
+
+        async with self._init_lock:
+            # 双重检查：等锁期间可能已被其他协程连接
+            if self._connected:
+                return
             try:
                 self._redis = redis.Redis(
                     host=settings.redis.host,
@@ -170,7 +237,8 @@ class RedisCache(CacheBackend):
                     db=settings.redis.db,
                     password=settings.redis.password,
                     max_connections=settings.redis.max_connections,
-                    decode_responses=True
+                    health_check_interval=30,  # 空闲连接复用前自动探活
+                    decode_responses=False  # orjson直接处理bytes，省一次UTF-8解码
                 )
                 await self._redis.ping()
                 self._connected = True
@@ -185,18 +253,31 @@ class RedisCache(CacheBackend):
             await self._ensure_connected()
             value = await self._redis.get(key)
             if value:
-                return json.loads(value)
+                value = orjson.loads(value)
+                # 带类型标签的条目还原回Pydantic模型：与内存后端
+                # 返回的活对象保持同一形状，调用方无需感知后端差异
+                if isinstance(value, dict) and "__pydantic__" in value:
+                    module_name, _, qualname = value["__pydantic__"].partition(":")
+                    model_cls = getattr(importlib.import_module(module_name), qualname)
+                    return model_cls.model_validate(value["data"])
+                return value
             return None
         except Exception as e:
             logger.error("获取Redis缓存失败", key=key, error=str(e))
             return None
-    
+
     async def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
         """设置缓存"""
         try:
             await self._ensure_connected()
-            serialized_value = json.dumps(value, ensure_ascii=False)
-            await self._redis.setex(key, ttl, serialized_value)
+            # Pydantic模型转为可JSON化的字典，避免datetime等类型问题；
+            # 同时打上类型标签，读取侧据此还原为模型实例
+            if hasattr(value, "model_dump"):
+                value = {
+                    "__pydantic__": f"{type(value).__module__}:{type(value).__qualname__}",
+                    "data": value.model_dump(mode="json"),
+                }
+            await self._redis.setex(key, ttl, orjson.dumps(value))
             return True
         except Exception as e:
             logger.error("设置Redis缓存失败", key=key, error=str(e))
@@ -212,6 +293,17 @@ class RedisCache(CacheBackend):
             logger.error("删除Redis缓存失败", key=key, error=str(e))
             return False
     
+    async def delete_many(self, keys: list) -> int:
+        """批量删除缓存（Redis DEL为变长参数，一次往返）"""
+        if not keys:
+            return 0
+        try:
+            await self._ensure_connected()
+            return await self._redis.delete(*keys)
+        except Exception as e:
+            logger.error("批量删除Redis缓存失败", keys=keys, error=str(e))
+            return 0
+
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
         try:
@@ -230,7 +322,16 @@ class RedisCache(CacheBackend):
         except Exception as e:
             logger.error("清空Redis缓存失败", error=str(e))
             return False
-    
+
+    async def ping(self) -> bool:
+        """轻量存活探测（单次PING往返）"""
+        try:
+            await self._ensure_connected()
+            return await self._redis.ping()
+        except Exception as e:
+            logger.error("Redis PING失败", error=str(e))
+            return False
+
     async def shutdown(self):
         """关闭Redis连接"""
         if self._redis:
@@ -238,6 +339,137 @@ class RedisCache(CacheBackend):
             self._connected = False
 
 
+class SemanticQueryCache:
+    """语义查询缓存
+
+    按查询嵌入的余弦相似度做近似查找，使措辞略有差异的近似重复
+    查询（如大小写/标点不同）命中同一条缓存结果，省去整个
+    嵌入+pgvector检索往返。
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: int = 3600, threshold: float = 0.95):
+        # 条目上限跨所有桶统计：scope含调用方传入的浮点阈值，
+        # 桶的数量不受控，按桶限额挡不住总内存
+        self._max_entries = max_entries
+        self._default_ttl = ttl
+        self._threshold = threshold
+        self._lock = asyncio.Lock()
+        # 按搜索参数(scope)分桶：每桶一个归一化嵌入矩阵和对应条目
+        # 列表。嵌入只编码查询文本，search_type/阈值/条数不同的请求
+        # 语义上是不同的问题，必须各自命中各自的桶。
+        # scope -> [matrix(float16, N×dim) | None, entries]
+        # entries每项为 [value, timestamp, ttl, hits]
+        self._buckets: Dict[tuple, list] = {}
+        self._total_entries = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec = vec / norm
+        return vec
+
+    async def lookup(self, embedding, scope: tuple = (),
+                     threshold: Optional[float] = None) -> Optional[Any]:
+        """按余弦相似度在指定参数桶内查找缓存结果"""
+        async with self._lock:
+            bucket = self._buckets.get(scope)
+            if bucket is None or bucket[0] is None:
+                return None
+
+            vec = self._normalize(embedding)
+            # 反量化回float32再做点积，保持相似度精度
+            similarities = bucket[0].astype(np.float32) @ vec
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < (threshold or self._threshold):
+                return None
+
+            entry = bucket[1][best]
+            if time.time() - entry[1] > entry[2]:
+                # 过期条目：删除后视为未命中
+                self._remove(scope, best)
+                return None
+
+            entry[3] += 1
+            return entry[0]
+
+    async def store(self, embedding, value: Any, scope: tuple = (),
+                    ttl: Optional[int] = None) -> None:
+        """写入缓存条目到指定参数桶"""
+        async with self._lock:
+            # FP16量化存储：归一化向量的分量都在[-1,1]内，精度损失可忽略
+            vec = self._normalize(embedding).astype(np.float16)
+
+            if self._total_entries >= self._max_entries:
+                # 先清理已过期的条目；仍然满则淘汰全局最旧的一条
+                self._sweep_expired()
+                if self._total_entries >= self._max_entries:
+                    self._evict_oldest()
+
+            bucket = self._buckets.get(scope)
+            if bucket is None:
+                bucket = [None, []]
+                self._buckets[scope] = bucket
+
+            if bucket[0] is None:
+                bucket[0] = vec.reshape(1, -1)
+            else:
+                bucket[0] = np.vstack([bucket[0], vec])
+            bucket[1].append([value, time.time(), ttl or self._default_ttl, 0])
+            self._total_entries += 1
+
+    def _remove(self, scope: tuple, index: int) -> None:
+        """删除指定桶中的指定行，空桶随之丢弃（调用方需持有锁）"""
+        bucket = self._buckets[scope]
+        del bucket[1][index]
+        self._total_entries -= 1
+        if not bucket[1]:
+            del self._buckets[scope]
+        else:
+            bucket[0] = np.delete(bucket[0], index, axis=0)
+
+    def _sweep_expired(self) -> None:
+        """清除所有桶中已过期的条目（调用方需持有锁）
+
+        过期条目原本只在恰好赢得argmax时才被剔除，长尾条目会一直
+        占着内存；写入侧到达上限时统一扫一遍。
+        """
+        now = time.time()
+        for scope in list(self._buckets):
+            bucket = self._buckets[scope]
+            keep = [i for i, e in enumerate(bucket[1]) if now - e[1] <= e[2]]
+            if len(keep) == len(bucket[1]):
+                continue
+            self._total_entries -= len(bucket[1]) - len(keep)
+            if not keep:
+                del self._buckets[scope]
+            else:
+                bucket[0] = bucket[0][keep]
+                bucket[1] = [bucket[1][i] for i in keep]
+
+    def _evict_oldest(self) -> None:
+        """淘汰全局最旧的条目（调用方需持有锁）
+
+        桶内条目按写入时间追加，桶首即桶内最旧，只需比较各桶桶首。
+        """
+        oldest_scope = None
+        oldest_ts = float("inf")
+        for scope, bucket in self._buckets.items():
+            if bucket[1] and bucket[1][0][1] < oldest_ts:
+                oldest_ts = bucket[1][0][1]
+                oldest_scope = scope
+        if oldest_scope is not None:
+            self._remove(oldest_scope, 0)
+
+    async def clear(self) -> None:
+        """清空缓存"""
+        async with self._lock:
+            self._buckets.clear()
+            self._total_entries = 0
+
+
 class CacheManager:
     """缓存管理器"""
     
@@ -260,7 +492,21 @@ class CacheManager:
             self._backend = MemoryCache()
         
         self._initialized = True
-    
+
+    async def get(self, key: str) -> Optional[Any]:
+        """通用读缓存（透传到后端）"""
+        if not self._initialized:
+            await self.initialize()
+
+        return await self._backend.get(key)
+
+    async def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
+        """通用写缓存（透传到后端）"""
+        if not self._initialized:
+            await self.initialize()
+
+        return await self._backend.set(key, value, ttl)
+
     async def get_tools_cache(self, server_name: str) -> Optional[list]:
         """获取工具缓存"""
         if not self._initialized:
@@ -318,13 +564,10 @@ class CacheManager:
             f"tools:{server_name}",
             f"status:{server_name}"
         ]
-        
-        success = True
-        for key in keys:
-            result = await self._backend.delete(key)
-            success = success and result
-        
-        return success
+
+        # 批量删除：N次往返合并为1次
+        await self._backend.delete_many(keys)
+        return True
     
     async def shutdown(self):
         """关闭缓存"""
@@ -333,4 +576,7 @@ class CacheManager:
 
 
 # 全局缓存管理器实例
-cache_manager = CacheManager()
\ No newline at end of file
+cache_manager = CacheManager()
+
+# 全局语义查询缓存实例
+semantic_query_cache = SemanticQueryCache()
\ No newline at end of file
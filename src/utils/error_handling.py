@@ -1,29 +1,87 @@
 """错误处理和重试机制"""
 import asyncio
+import atexit
+import re
+import time
 import traceback
 from typing import Any, Dict, Optional, Union, Callable, Type
-from enum import Enum
-from dataclasses import dataclass
+from enum import StrEnum
+from dataclasses import dataclass, replace
 from functools import wraps
 
+import openai
 from tenacity import (
-    retry,
+    AsyncRetrying,
     stop_after_attempt,
     wait_exponential,
-    retry_if_exception_type,
-    retry_if_result,
-    RetryError
+    retry_if_exception_type
 )
-from circuitbreaker import circuit, CircuitBreakerError
-
 from src.utils.logging import get_structured_logger
 from src.utils.metrics import metrics
 
 logger = get_structured_logger(__name__)
 
 
-class ErrorType(Enum):
-    """错误类型枚举"""
+class _ErrorCounterBuffer:
+    """进程内错误计数缓冲
+
+    每次metrics.record_error都要经过Prometheus客户端的加锁计数器，
+    错误风暴下锁竞争明显。先在普通dict里累加，攒够一批或超过
+    时间窗口再按(错误类型, 组件)批量刷出，均摊锁开销。
+    """
+
+    __slots__ = ("_counts", "_pending", "_last_flush_ns")
+
+    _FLUSH_THRESHOLD = 64               # 累计错误数达到该值即刷出
+    _FLUSH_INTERVAL_NS = 1_000_000_000  # 最长缓冲1秒
+
+    def __init__(self):
+        self._counts: Dict[tuple, int] = {}
+        self._pending = 0
+        self._last_flush_ns = time.monotonic_ns()
+
+    def add(self, error_type: str, component: str) -> None:
+        key = (error_type, component)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._pending += 1
+        now = time.monotonic_ns()
+        if (self._pending >= self._FLUSH_THRESHOLD
+                or now - self._last_flush_ns >= self._FLUSH_INTERVAL_NS):
+            self.flush(now)
+
+    def flush(self, now_ns: Optional[int] = None) -> None:
+        """将缓冲的计数批量写入Prometheus计数器"""
+        if self._counts:
+            for (error_type, component), count in self._counts.items():
+                metrics.record_error(error_type, component, count)
+            self._counts.clear()
+        self._pending = 0
+        self._last_flush_ns = now_ns if now_ns is not None else time.monotonic_ns()
+
+
+# 全局错误计数缓冲实例
+_error_buffer = _ErrorCounterBuffer()
+
+
+def flush_error_metrics() -> None:
+    """把缓冲中尚未上报的错误计数立即刷入Prometheus
+
+    add()只有在新错误到来时才有机会触发刷出；错误风暴平息后
+    残留的计数靠健康检查周期调用本函数兜底排空，进程退出时
+    再由atexit钩子做最后一次冲刷。
+    """
+    _error_buffer.flush()
+
+
+atexit.register(flush_error_metrics)
+
+
+class ErrorType(StrEnum):
+    """错误类型枚举
+
+    StrEnum成员本身就是字符串，日志和指标直接使用，
+    无需每次做.value描述符查找。
+    """
     CONNECTION_ERROR = "connection_error"
     TIMEOUT_ERROR = "timeout_error"
     AUTHENTICATION_ERROR = "authentication_error"
@@ -35,16 +93,24 @@ class ErrorType(Enum):
     CIRCUIT_BREAKER_ERROR = "circuit_breaker_error"
 
 
-@dataclass
+@dataclass(slots=True)
 class ErrorInfo:
     """错误信息"""
     error_type: ErrorType
     message: str
     details: Optional[Dict[str, Any]] = None
-    traceback: Optional[str] = None
+    # 字符串或惰性求值的thunk，统一通过traceback_str访问
+    traceback: Optional[Union[str, Callable[[], str]]] = None
     component: str = "unknown"
     recoverable: bool = True
 
+    @property
+    def traceback_str(self) -> Optional[str]:
+        """格式化的回溯信息（首次访问时求值并缓存）"""
+        if callable(self.traceback):
+            self.traceback = self.traceback()
+        return self.traceback
+
 
 class MCPException(Exception):
     """MCP自定义异常基类"""
@@ -89,21 +155,53 @@ class OpenAIAPIException(MCPException):
     pass
 
 
+# 可重试异常类型：元组供isinstance回退，frozenset提供精确类型的O(1)快速路径
+_RETRIABLE_TYPES = (
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+    ConnectionException,
+    TimeoutException,
+)
+# 快速路径只收内置类型：MCP异常子类仍需读取自身的recoverable标志
+_RETRIABLE_FAST = frozenset((ConnectionError, TimeoutError, asyncio.TimeoutError))
+
+
 def is_retriable_error(exception: Exception) -> bool:
     """判断异常是否可重试"""
+    # 精确类型命中：一次哈希探测，跳过MRO遍历
+    if type(exception) in _RETRIABLE_FAST:
+        return True
+
     if isinstance(exception, MCPException):
         return exception.error_info.recoverable
-    
-    # 特定异常类型的重试逻辑
-    retriable_types = (
-        ConnectionError,
-        TimeoutError,
-        asyncio.TimeoutError,
-        ConnectionException,
-        TimeoutException,
-    )
-    
-    return isinstance(exception, retriable_types)
+
+    return isinstance(exception, _RETRIABLE_TYPES)
+
+
+# 重试条件与策略单例：同一参数组合的stop/wait对象跨调用复用，
+# 不再在每次函数调用时重建策略对象
+_RETRY_CONDITION = retry_if_exception_type((
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+    ConnectionException,
+    TimeoutException,
+))
+_RETRY_POLICIES: Dict[tuple, tuple] = {}
+
+
+def _get_retry_policy(max_attempts: int, min_wait: float, max_wait: float) -> tuple:
+    """获取（或创建）指定参数的stop/wait策略单例"""
+    key = (max_attempts, min_wait, max_wait)
+    policy = _RETRY_POLICIES.get(key)
+    if policy is None:
+        policy = (
+            stop_after_attempt(max_attempts),
+            wait_exponential(multiplier=1, min=min_wait, max=max_wait),
+        )
+        _RETRY_POLICIES[key] = policy
+    return policy
 
 
 def create_retry_decorator(
@@ -113,50 +211,91 @@ def create_retry_decorator(
     component: str = "unknown"
 ):
     """创建重试装饰器"""
-    
+
     def decorator(func: Callable):
-        @retry(
-            stop=stop_after_attempt(max_attempts),
-            wait=wait_exponential(multiplier=1, min=min_wait, max=max_wait),
-            retry=retry_if_exception_type((
-                ConnectionError,
-                TimeoutError,
-                asyncio.TimeoutError,
-                ConnectionException,
-                TimeoutException,
-            )),
-            reraise=True
-        )
+        stop, wait = _get_retry_policy(max_attempts, min_wait, max_wait)
+        # 装饰时绑定上下文字段，热路径日志调用不再每次传入相同kwargs
+        comp_logger = logger.bind(component=component, function=func.__name__)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
+            # reraise=True直接抛出原始异常，省去RetryError解包层，
+            # 每次调用只有这一个包装帧
             try:
-                return await func(*args, **kwargs)
-            except RetryError as e:
-                # 记录重试失败
-                original_error = e.last_attempt.exception()
-                logger.error(
-                    "重试失败",
-                    component=component,
-                    function=func.__name__,
-                    attempts=max_attempts,
-                    error=str(original_error)
-                )
-                metrics.record_error("retry_failed", component)
-                raise original_error
+                async for attempt in AsyncRetrying(
+                    stop=stop, wait=wait, retry=_RETRY_CONDITION, reraise=True
+                ):
+                    with attempt:
+                        return await func(*args, **kwargs)
             except Exception as e:
-                logger.error(
-                    "函数执行失败",
-                    component=component,
-                    function=func.__name__,
-                    error=str(e)
-                )
-                metrics.record_error(type(e).__name__, component)
+                if is_retriable_error(e):
+                    # 可重试异常到这里说明重试已耗尽
+                    comp_logger.error(
+                        "重试失败",
+                        attempts=max_attempts,
+                        error=str(e)
+                    )
+                    _error_buffer.add("retry_failed", component)
+                else:
+                    comp_logger.error(
+                        "函数执行失败",
+                        error=str(e)
+                    )
+                    _error_buffer.add(type(e).__name__, component)
                 raise
-        
+
         return wrapper
     return decorator
 
 
+# 断路器状态常量：整数比较是最快的状态检查
+_CB_CLOSED = 0
+_CB_OPEN = 1
+_CB_HALF_OPEN = 2
+
+
+class CircuitBreaker:
+    """最小化断路器状态机
+
+    状态、失败计数和打开时间全部是整数字段，闭合状态下的快速
+    路径只有一次整数比较；恢复超时用time.monotonic_ns()的整数
+    差值判断，不构造datetime对象。
+    """
+
+    __slots__ = ("_failure_threshold", "_recovery_timeout_ns",
+                 "_state", "_failures", "_opened_at_ns")
+
+    def __init__(self, failure_threshold: int, recovery_timeout: int):
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout_ns = recovery_timeout * 1_000_000_000
+        self._state = _CB_CLOSED
+        self._failures = 0
+        self._opened_at_ns = 0
+
+    @property
+    def is_open(self) -> bool:
+        """断路器是否拒绝请求（冷却期结束后转半开放行一次试探）"""
+        if self._state == _CB_OPEN:
+            if time.monotonic_ns() - self._opened_at_ns < self._recovery_timeout_ns:
+                return True
+            self._state = _CB_HALF_OPEN
+        return False
+
+    def on_success(self) -> None:
+        """成功调用：半开试探成功则闭合，并清零失败计数"""
+        if self._state != _CB_CLOSED:
+            self._state = _CB_CLOSED
+        if self._failures:
+            self._failures = 0
+
+    def on_failure(self) -> None:
+        """失败调用：计数并在达到阈值（或半开试探失败）时打开"""
+        self._failures += 1
+        if self._state == _CB_HALF_OPEN or self._failures >= self._failure_threshold:
+            self._state = _CB_OPEN
+            self._opened_at_ns = time.monotonic_ns()
+
+
 def create_circuit_breaker(
     failure_threshold: int = 5,
     recovery_timeout: int = 30,
@@ -164,44 +303,57 @@ def create_circuit_breaker(
     component: str = "unknown"
 ):
     """创建断路器装饰器"""
-    
+
     def decorator(func: Callable):
-        @circuit(
-            failure_threshold=failure_threshold,
-            recovery_timeout=recovery_timeout,
-            expected_exception=expected_exception
+        breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        # 装饰时绑定上下文字段，热路径日志调用不再每次传入相同kwargs
+        comp_logger = logger.bind(component=component, function=func.__name__)
+        # 拒绝异常的分类信息固定，装饰时构造一次模板；每次拒绝
+        # 抛出浅拷贝出的新异常实例——复用同一个实例会让
+        # __traceback__随每次raise无限追加帧，并发任务还会互相
+        # 改写__context__和handle_error写入的details/traceback
+        open_error_info = ErrorInfo(
+            error_type=ErrorType.CIRCUIT_BREAKER_ERROR,
+            message="服务暂时不可用: 断路器已打开",
+            component=component,
+            recoverable=False
         )
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
+            if breaker.is_open:
+                comp_logger.warning("断路器打开")
+                _error_buffer.add("circuit_breaker_open", component)
+                raise MCPException(replace(open_error_info))
+
             try:
-                return await func(*args, **kwargs)
-            except CircuitBreakerError as e:
-                logger.warning(
-                    "断路器打开",
-                    component=component,
-                    function=func.__name__,
-                    reason=str(e)
-                )
-                metrics.record_error("circuit_breaker_open", component)
-                raise MCPException(ErrorInfo(
-                    error_type=ErrorType.CIRCUIT_BREAKER_ERROR,
-                    message=f"服务暂时不可用: {str(e)}",
-                    component=component,
-                    recoverable=False
-                ))
-            except Exception as e:
-                logger.error(
-                    "断路器包装函数失败",
-                    component=component,
-                    function=func.__name__,
-                    error=str(e)
-                )
+                result = await func(*args, **kwargs)
+            except expected_exception as e:
+                breaker.on_failure()
+                comp_logger.error("断路器包装函数失败", error=str(e))
                 raise
-        
+
+            breaker.on_success()
+            return result
+
         return wrapper
     return decorator
 
 
+# 异常类型 -> (错误类型, 用户消息, 是否可恢复) 分类表：
+# 按MRO取最近祖先，O(1)字典探测取代isinstance分支链
+_ERROR_CLASSIFIER: Dict[type, tuple] = {
+    ConnectionError: (ErrorType.CONNECTION_ERROR, "连接服务器失败，请稍后重试", True),
+    ConnectionException: (ErrorType.CONNECTION_ERROR, "连接服务器失败，请稍后重试", True),
+    TimeoutError: (ErrorType.TIMEOUT_ERROR, "请求超时，请稍后重试", True),
+    asyncio.TimeoutError: (ErrorType.TIMEOUT_ERROR, "请求超时，请稍后重试", True),
+    TimeoutException: (ErrorType.TIMEOUT_ERROR, "请求超时，请稍后重试", True),
+    AuthenticationException: (ErrorType.AUTHENTICATION_ERROR, "认证失败，请检查API密钥", False),
+    RateLimitException: (ErrorType.RATE_LIMIT_ERROR, "请求频率过高，请稍后重试", True),
+    ValidationException: (ErrorType.VALIDATION_ERROR, "请求参数无效", False),
+}
+
+
 async def handle_error(
     error: Exception,
     component: str,
@@ -209,76 +361,67 @@ async def handle_error(
     user_friendly: bool = True
 ) -> ErrorInfo:
     """统一错误处理"""
-    
-    # 获取错误追踪信息
-    error_traceback = traceback.format_exc()
-    
-    # 分类错误
+
+    # 回溯信息惰性求值：只有真正读取traceback_str时才走栈遍历和格式化
+    error_traceback = lambda exc=error: "".join(
+        traceback.format_exception(type(exc), exc, exc.__traceback__)
+    )
+
+    # 分类错误：MCP异常自带分类信息，其余按MRO查分类表
     if isinstance(error, MCPException):
         error_info = error.error_info
-    elif isinstance(error, (ConnectionError, ConnectionException)):
-        error_info = ErrorInfo(
-            error_type=ErrorType.CONNECTION_ERROR,
-            message="连接服务器失败，请稍后重试",
-            component=component,
-            recoverable=True
-        )
-    elif isinstance(error, (TimeoutError, asyncio.TimeoutError, TimeoutException)):
-        error_info = ErrorInfo(
-            error_type=ErrorType.TIMEOUT_ERROR,
-            message="请求超时，请稍后重试",
-            component=component,
-            recoverable=True
-        )
-    elif isinstance(error, (AuthenticationException,)):
-        error_info = ErrorInfo(
-            error_type=ErrorType.AUTHENTICATION_ERROR,
-            message="认证失败，请检查API密钥",
-            component=component,
-            recoverable=False
-        )
-    elif isinstance(error, (RateLimitException,)):
-        error_info = ErrorInfo(
-            error_type=ErrorType.RATE_LIMIT_ERROR,
-            message="请求频率过高，请稍后重试",
-            component=component,
-            recoverable=True
-        )
-    elif isinstance(error, (ValidationException,)):
-        error_info = ErrorInfo(
-            error_type=ErrorType.VALIDATION_ERROR,
-            message="请求参数无效",
-            component=component,
-            recoverable=False
-        )
     else:
-        error_info = ErrorInfo(
-            error_type=ErrorType.INTERNAL_ERROR,
-            message="内部服务器错误" if user_friendly else str(error),
-            component=component,
-            recoverable=False
-        )
-    
+        # 精确类型命中是绝大多数情况，单次字典探测即可；
+        # 只有子类实例才需要沿MRO回退
+        classified = _ERROR_CLASSIFIER.get(type(error))
+        if classified is None:
+            for cls in type(error).__mro__[1:]:
+                classified = _ERROR_CLASSIFIER.get(cls)
+                if classified is not None:
+                    break
+
+        if classified is not None:
+            error_type, message, recoverable = classified
+            error_info = ErrorInfo(
+                error_type=error_type,
+                message=message,
+                component=component,
+                recoverable=recoverable
+            )
+        else:
+            error_info = ErrorInfo(
+                error_type=ErrorType.INTERNAL_ERROR,
+                message="内部服务器错误" if user_friendly else str(error),
+                component=component,
+                recoverable=False
+            )
+
     # 添加详细信息
     error_info.details = context or {}
     error_info.traceback = error_traceback
     
-    # 记录错误
+    # 记录错误：exc_info交给structlog的dict_tracebacks处理器，
+    # 只有事件通过级别过滤真正发出时才提取回溯帧
     logger.error(
         "处理错误",
-        error_type=error_info.error_type.value,
+        error_type=error_info.error_type,
         component=component,
         message=error_info.message,
         recoverable=error_info.recoverable,
-        context=context
+        context=context,
+        exc_info=error
     )
     
     # 记录指标
-    metrics.record_error(error_info.error_type.value, component)
+    _error_buffer.add(error_info.error_type, component)
     
     return error_info
 
 
+# 回退用的OpenAI错误特征正则（忽略大小写，单次扫描）
+_OPENAI_ERROR_PATTERN = re.compile(r"rate[_ ]limit|unauthorized|authentication", re.I)
+
+
 class ErrorHandler:
     """错误处理器"""
     
@@ -308,10 +451,24 @@ class ErrorHandler:
     async def handle_openai_error(self, error: Exception, model: str) -> ErrorInfo:
         """处理OpenAI API错误"""
         context = {"model": model}
-        
-        # 特殊处理OpenAI错误
         error_message = str(error)
-        if "rate limit" in error_message.lower():
+
+        # 优先用SDK的类型化异常判断，免去对长错误字符串的扫描；
+        # 未知类型才回退到一次正则匹配（单遍扫描取代两次lower+子串查找）
+        if isinstance(error, openai.RateLimitError):
+            matched = "rate_limit"
+        elif isinstance(error, openai.AuthenticationError):
+            matched = "authentication"
+        else:
+            m = _OPENAI_ERROR_PATTERN.search(error_message)
+            if m is None:
+                matched = None
+            elif "rate" in m.group(0).lower():
+                matched = "rate_limit"
+            else:
+                matched = "authentication"
+
+        if matched == "rate_limit":
             error_info = ErrorInfo(
                 error_type=ErrorType.RATE_LIMIT_ERROR,
                 message="OpenAI API请求频率限制",
@@ -319,7 +476,7 @@ class ErrorHandler:
                 recoverable=True,
                 details=context
             )
-        elif "authentication" in error_message.lower() or "unauthorized" in error_message.lower():
+        elif matched == "authentication":
             error_info = ErrorInfo(
                 error_type=ErrorType.AUTHENTICATION_ERROR,
                 message="OpenAI API认证失败",
@@ -339,12 +496,12 @@ class ErrorHandler:
         # 记录错误
         logger.error(
             "OpenAI API错误",
-            error_type=error_info.error_type.value,
+            error_type=error_info.error_type,
             model=model,
             message=error_message
         )
         
-        metrics.record_error(error_info.error_type.value, self.component)
+        _error_buffer.add(error_info.error_type, self.component)
         
         return error_info
 
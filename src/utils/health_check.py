@@ -4,9 +4,17 @@ import time
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass, field
 from enum import Enum
+from urllib.parse import urlparse
 
+try:
+    import psutil
+except ImportError:
+    psutil = None  # 可选依赖：缺失时内存/磁盘检查返回UNKNOWN
+
+from src.config.settings import settings
 from src.utils.logging import get_structured_logger
 from src.utils.cache import cache_manager
+from src.utils.error_handling import flush_error_metrics
 
 logger = get_structured_logger(__name__)
 
@@ -19,6 +27,20 @@ class HealthStatus(Enum):
     UNKNOWN = "unknown"
 
 
+# 状态严重度映射：整体状态 = 各组件中严重度最高者，单次max即可得出
+_STATUS_SEVERITY = {
+    HealthStatus.HEALTHY: 0,
+    HealthStatus.DEGRADED: 1,
+    HealthStatus.UNHEALTHY: 2,
+    HealthStatus.UNKNOWN: 0,
+}
+_SEVERITY_STATUS = (
+    HealthStatus.HEALTHY,
+    HealthStatus.DEGRADED,
+    HealthStatus.UNHEALTHY,
+)
+
+
 @dataclass
 class HealthCheckResult:
     """健康检查结果"""
@@ -30,30 +52,37 @@ class HealthCheckResult:
     response_time: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class SystemHealth:
-    """系统健康状态"""
+    """系统健康状态
+
+    构建后不再变更，字典序列化结果按实例缓存，
+    k8s探针高频访问时不重复分配组件字典列表。
+    """
     overall_status: HealthStatus
     components: List[HealthCheckResult]
     timestamp: float = field(default_factory=time.time)
-    
+    _as_dict: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False)
+
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
-        return {
-            "overall_status": self.overall_status.value,
-            "timestamp": self.timestamp,
-            "components": [
-                {
-                    "component": result.component,
-                    "status": result.status.value,
-                    "message": result.message,
-                    "details": result.details,
-                    "response_time": result.response_time,
-                    "timestamp": result.timestamp
-                }
-                for result in self.components
-            ]
-        }
+        """转换为字典（首次调用后缓存）"""
+        if self._as_dict is None:
+            self._as_dict = {
+                "overall_status": self.overall_status.value,
+                "timestamp": self.timestamp,
+                "components": [
+                    {
+                        "component": result.component,
+                        "status": result.status.value,
+                        "message": result.message,
+                        "details": result.details,
+                        "response_time": result.response_time,
+                        "timestamp": result.timestamp
+                    }
+                    for result in self.components
+                ]
+            }
+        return self._as_dict
 
 
 class HealthChecker:
@@ -64,6 +93,25 @@ class HealthChecker:
         self._check_interval = 30  # 秒
         self._check_task: Optional[asyncio.Task] = None
         self._running = False
+        # 系统指标短期缓存 {指标名: (采样时间, 值)}，避免高频检查重复走系统调用
+        self._sys_cache: Dict[str, tuple] = {}
+        # 缓存探测节流：常规周期只做ping，每10个周期或ping失败后做完整回路
+        self._cache_check_cycle = 0
+        self._cache_probe_escalated = False
+
+    def _cached_sys_metric(self, name: str, fetch):
+        """短期缓存系统指标
+
+        检查频率高于采样间隔一半时直接复用上次采样，
+        省去重复的/proc读取和statvfs系统调用。
+        """
+        now = time.monotonic()
+        cached = self._sys_cache.get(name)
+        if cached and now - cached[0] < self._check_interval / 2:
+            return cached[1]
+        value = fetch()
+        self._sys_cache[name] = (now, value)
+        return value
     
     async def start(self):
         """启动健康检查"""
@@ -90,6 +138,9 @@ class HealthChecker:
         while self._running:
             try:
                 await self.check_system_health()
+                # 顺带排空错误计数缓冲：错误停止到来后残留的
+                # 计数不能一直扣在缓冲里不见于指标
+                flush_error_metrics()
                 await asyncio.sleep(self._check_interval)
             except asyncio.CancelledError:
                 break
@@ -97,30 +148,43 @@ class HealthChecker:
                 logger.error("定期健康检查失败", error=str(e))
                 await asyncio.sleep(self._check_interval)
     
+    @staticmethod
+    async def _safe(check, semaphore: asyncio.Semaphore) -> HealthCheckResult:
+        """包装单项检查：异常就地转为UNHEALTHY结果
+
+        所有检查统一返回HealthCheckResult，汇总侧无需再做
+        isinstance分拣；组件名从检查函数名推导。
+        """
+        async with semaphore:
+            try:
+                return await check()
+            except Exception as e:
+                return HealthCheckResult(
+                    component=check.__name__.replace("_check_", ""),
+                    status=HealthStatus.UNHEALTHY,
+                    message=f"健康检查异常: {str(e)}"
+                )
+
     async def check_system_health(self) -> SystemHealth:
         """检查系统健康状态"""
-        components = []
-        
-        # 并发执行所有健康检查
-        check_tasks = [
-            self._check_cache(),
-            self._check_memory(),
-            self._check_disk_space(),
-            self._check_network(),
-        ]
-        
-        results = await asyncio.gather(*check_tasks, return_exceptions=True)
-        
-        for result in results:
-            if isinstance(result, HealthCheckResult):
-                components.append(result)
-            elif isinstance(result, Exception):
-                components.append(HealthCheckResult(
-                    component="unknown",
-                    status=HealthStatus.UNHEALTHY,
-                    message=f"健康检查异常: {str(result)}"
-                ))
-        
+        # 信号量限制并发检查数，避免缓存/网络探测在主机高压时扎堆
+        semaphore = asyncio.Semaphore(2)
+
+        # TaskGroup并发执行所有检查：无gather的结果包装开销，
+        # 关闭时取消语义也更确定
+        async with asyncio.TaskGroup() as tg:
+            tasks = [
+                tg.create_task(self._safe(check, semaphore))
+                for check in (
+                    self._check_cache,
+                    self._check_memory,
+                    self._check_disk_space,
+                    self._check_network,
+                )
+            ]
+
+        components = [task.result() for task in tasks]
+
         # 计算整体健康状态
         overall_status = self._calculate_overall_status(components)
         
@@ -142,30 +206,51 @@ class HealthChecker:
         if not components:
             return HealthStatus.UNKNOWN
         
-        unhealthy_count = sum(1 for c in components if c.status == HealthStatus.UNHEALTHY)
-        degraded_count = sum(1 for c in components if c.status == HealthStatus.DEGRADED)
-        
-        # 如果有任何组件不健康，整体状态为不健康
-        if unhealthy_count > 0:
-            return HealthStatus.UNHEALTHY
-        
-        # 如果有降级组件，整体状态为降级
-        if degraded_count > 0:
-            return HealthStatus.DEGRADED
-        
-        return HealthStatus.HEALTHY
+        # 单次遍历取最高严重度，替代按状态各扫一遍的多次sum
+        severity = max(_STATUS_SEVERITY[c.status] for c in components)
+        return _SEVERITY_STATUS[severity]
     
     async def _check_cache(self) -> HealthCheckResult:
-        """检查缓存健康状态"""
+        """检查缓存健康状态
+
+        常规周期只做一次轻量ping（Redis后端为1次往返）；每10个
+        周期、或上次ping失败后，才执行完整的set/get/delete回路
+        以检测静默损坏。
+        """
         start_time = time.time()
-        
+
         try:
-            # 尝试设置和获取测试键
+            await cache_manager.initialize()
+
+            self._cache_check_cycle += 1
+            full_probe = (
+                self._cache_probe_escalated
+                or self._cache_check_cycle % 10 == 1
+            )
+
+            if not full_probe:
+                if await cache_manager._backend.ping():
+                    response_time = time.time() - start_time
+                    if response_time > 1.0:
+                        return HealthCheckResult(
+                            component="cache",
+                            status=HealthStatus.DEGRADED,
+                            message=f"缓存响应缓慢: {response_time:.2f}s",
+                            response_time=response_time
+                        )
+                    return HealthCheckResult(
+                        component="cache",
+                        status=HealthStatus.HEALTHY,
+                        message="缓存正常",
+                        response_time=response_time
+                    )
+                # ping失败：本次及下次升级为完整探测
+                self._cache_probe_escalated = True
+
+            # 完整探测：设置和获取测试键
             test_key = "health_check_test"
             test_value = {"timestamp": time.time()}
-            
-            await cache_manager.initialize()
-            
+
             # 设置测试值
             set_success = await cache_manager._backend.set(test_key, test_value, 60)
             if not set_success:
@@ -188,7 +273,10 @@ class HealthChecker:
             
             # 清理测试键
             await cache_manager._backend.delete(test_key)
-            
+
+            # 完整回路通过，恢复轻量探测
+            self._cache_probe_escalated = False
+
             response_time = time.time() - start_time
             
             if response_time > 1.0:  # 响应时间超过1秒视为降级
@@ -217,11 +305,17 @@ class HealthChecker:
     async def _check_memory(self) -> HealthCheckResult:
         """检查内存使用情况"""
         start_time = time.time()
-        
+
+        if psutil is None:
+            return HealthCheckResult(
+                component="memory",
+                status=HealthStatus.UNKNOWN,
+                message="psutil模块未安装，无法检查内存",
+                response_time=time.time() - start_time
+            )
+
         try:
-            import psutil
-            
-            memory = psutil.virtual_memory()
+            memory = self._cached_sys_metric("virtual_memory", psutil.virtual_memory)
             memory_percent = memory.percent
             
             status = HealthStatus.HEALTHY
@@ -245,14 +339,7 @@ class HealthChecker:
                 },
                 response_time=time.time() - start_time
             )
-            
-        except ImportError:
-            return HealthCheckResult(
-                component="memory",
-                status=HealthStatus.UNKNOWN,
-                message="psutil模块未安装，无法检查内存",
-                response_time=time.time() - start_time
-            )
+
         except Exception as e:
             return HealthCheckResult(
                 component="memory",
@@ -264,11 +351,17 @@ class HealthChecker:
     async def _check_disk_space(self) -> HealthCheckResult:
         """检查磁盘空间"""
         start_time = time.time()
-        
+
+        if psutil is None:
+            return HealthCheckResult(
+                component="disk",
+                status=HealthStatus.UNKNOWN,
+                message="psutil模块未安装，无法检查磁盘",
+                response_time=time.time() - start_time
+            )
+
         try:
-            import psutil
-            
-            disk = psutil.disk_usage('/')
+            disk = self._cached_sys_metric("disk_usage", lambda: psutil.disk_usage('/'))
             disk_percent = (disk.used / disk.total) * 100
             
             status = HealthStatus.HEALTHY
@@ -292,14 +385,7 @@ class HealthChecker:
                 },
                 response_time=time.time() - start_time
             )
-            
-        except ImportError:
-            return HealthCheckResult(
-                component="disk",
-                status=HealthStatus.UNKNOWN,
-                message="psutil模块未安装，无法检查磁盘",
-                response_time=time.time() - start_time
-            )
+
         except Exception as e:
             return HealthCheckResult(
                 component="disk",
@@ -309,41 +395,42 @@ class HealthChecker:
             )
     
     async def _check_network(self) -> HealthCheckResult:
-        """检查网络连接"""
+        """检查网络连接
+
+        用轻量TCP连接探测OpenAI网关可达性。之前每次检查都新建
+        aiohttp会话（连接器、cookie jar、SSL上下文全部重建）去请求
+        第三方站点，既昂贵又把第三方延迟算进了自身健康状态。
+        """
         start_time = time.time()
-        
+
         try:
-            import aiohttp
-            
-            # 测试网络连接
-            timeout = aiohttp.ClientTimeout(total=5)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get('https://httpbin.org/status/200') as response:
-                    if response.status == 200:
-                        response_time = time.time() - start_time
-                        
-                        if response_time > 3.0:
-                            return HealthCheckResult(
-                                component="network",
-                                status=HealthStatus.DEGRADED,
-                                message=f"网络响应缓慢: {response_time:.2f}s",
-                                response_time=response_time
-                            )
-                        
-                        return HealthCheckResult(
-                            component="network",
-                            status=HealthStatus.HEALTHY,
-                            message="网络连接正常",
-                            response_time=response_time
-                        )
-                    else:
-                        return HealthCheckResult(
-                            component="network",
-                            status=HealthStatus.UNHEALTHY,
-                            message=f"网络测试失败: HTTP {response.status}",
-                            response_time=time.time() - start_time
-                        )
-                        
+            parsed = urlparse(settings.openai.base_url)
+            host = parsed.hostname or "api.openai.com"
+            port = parsed.port or (80 if parsed.scheme == "http" else 443)
+
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout=5
+            )
+            writer.close()
+            await writer.wait_closed()
+
+            response_time = time.time() - start_time
+
+            if response_time > 3.0:
+                return HealthCheckResult(
+                    component="network",
+                    status=HealthStatus.DEGRADED,
+                    message=f"网络响应缓慢: {response_time:.2f}s",
+                    response_time=response_time
+                )
+
+            return HealthCheckResult(
+                component="network",
+                status=HealthStatus.HEALTHY,
+                message="网络连接正常",
+                response_time=response_time
+            )
+
         except Exception as e:
             return HealthCheckResult(
                 component="network",
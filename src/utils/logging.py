@@ -1,38 +1,82 @@
 """生产级日志配置"""
+import atexit
 import sys
 import logging
-from typing import Any, Dict
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import orjson
 import structlog
 from structlog import get_logger
 from src.config.settings import settings
 
+# 后台日志监听线程（进程级单例）
+_log_listener: Optional[QueueListener] = None
+
+
+@atexit.register
+def _stop_log_listener() -> None:
+    """进程退出时停止日志监听线程，冲刷剩余日志"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
 
 def setup_logging() -> None:
     """设置结构化日志"""
-    
-    # 配置标准库日志
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, settings.logging.level.upper())
-    )
-    
+    global _log_listener
+
+    # 标准库日志经队列转发：渲染和stdout写出在后台线程完成，
+    # 事件循环里的日志调用只剩一次put_nowait
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, settings.logging.level.upper()))
+    root_logger.handlers.clear()
+    root_logger.addHandler(QueueHandler(log_queue))
+
+    if _log_listener is not None:
+        _log_listener.stop()
+    _log_listener = QueueListener(log_queue, stream_handler)
+    _log_listener.start()
+
     # 配置structlog
     processors = [
         structlog.contextvars.merge_contextvars,
         structlog.processors.add_log_level,
         structlog.processors.TimeStamper(fmt="ISO"),
-        structlog.processors.CallsiteParameterAdder(
-            {
-                structlog.processors.CallsiteParameter.FILENAME,
-                structlog.processors.CallsiteParameter.FUNC_NAME,
-                structlog.processors.CallsiteParameter.LINENO,
-            }
-        ),
     ]
-    
+
+    # 调用点信息每条日志都要走一次帧栈提取（sys._getframe），
+    # 只在DEBUG级别保留；生产环境靠logger名和event字段定位
+    if settings.logging.level.upper() == "DEBUG":
+        processors.append(
+            structlog.processors.CallsiteParameterAdder(
+                {
+                    structlog.processors.CallsiteParameter.FILENAME,
+                    structlog.processors.CallsiteParameter.FUNC_NAME,
+                    structlog.processors.CallsiteParameter.LINENO,
+                }
+            )
+        )
+
     if settings.logging.format == "json":
-        processors.append(structlog.processors.JSONRenderer())
+        # 结构化回溯：exc_info在事件真正被发出时才提取为帧字典，
+        # 日志聚合侧拿到结构化数据而非需要反转义的大字符串。
+        # show_locals必须关闭：帧内局部变量会把Settings等对象的
+        # repr（含数据库口令、API密钥）原样写进日志流
+        processors.append(
+            structlog.processors.ExceptionRenderer(
+                structlog.tracebacks.ExceptionDictTransformer(show_locals=False)
+            )
+        )
+        # orjson比stdlib json快数倍；default=str兜底datetime等类型
+        processors.append(structlog.processors.JSONRenderer(
+            serializer=lambda obj, **kw: orjson.dumps(obj, default=str).decode()
+        ))
     else:
         processors.extend([
             structlog.dev.ConsoleRenderer(colors=True),
@@ -49,8 +93,12 @@ def setup_logging() -> None:
 
 
 def get_structured_logger(name: str = None) -> structlog.BoundLogger:
-    """获取结构化日志记录器"""
-    return get_logger(name)
+    """获取结构化日志记录器
+
+    bind()立即物化惰性代理，后续日志调用不再经过
+    BoundLoggerLazyProxy的每次分发。
+    """
+    return get_logger(name).bind()
 
 
 # 通用日志记录器
@@ -1,192 +1,250 @@
 """指标收集和监控"""
 import time
-from typing import Dict, Any, Optional
-from dataclasses import dataclass, field
-from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Dict, Any, Callable, Optional, Mapping
+
+import numpy as np
 from prometheus_client import Counter, Histogram, Gauge, Info
 
 from src.utils.logging import get_structured_logger
 
 logger = get_structured_logger(__name__)
 
+# 指标对象定义在模块级（与rag_metrics一致）：进程内只注册一次，
+# 收集器重复实例化（测试、worker、热重载）不会再触发
+# REGISTRY的Duplicated timeseries错误
+
+# 请求指标
+# 不带user_id标签：用户数无上界，按用户出时间序列会让
+# 采集端内存和抓取耗时随用户量线性膨胀
+MCP_REQUESTS_TOTAL = Counter(
+    'mcp_requests_total',
+    'Total number of requests',
+    ['method', 'endpoint', 'status']
+)
+
+# 显式桶边界：默认11桶×标签组合在/metrics导出时是大头，
+# 按各自典型耗时区间裁到7~8个桶
+MCP_REQUEST_DURATION = Histogram(
+    'mcp_request_duration_seconds',
+    'Request duration in seconds',
+    ['method', 'endpoint'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+
+# 连接池指标
+MCP_CONNECTION_POOL_SIZE = Gauge(
+    'mcp_connection_pool_size',
+    'Current connection pool size',
+    ['server_name']
+)
+
+MCP_ACTIVE_CONNECTIONS = Gauge(
+    'mcp_active_connections',
+    'Number of active connections',
+    ['server_name']
+)
+
+MCP_CONNECTION_ERRORS = Counter(
+    'mcp_connection_errors_total',
+    'Total connection errors',
+    ['server_name', 'error_type']
+)
+
+# 工具调用指标
+MCP_TOOL_CALLS_TOTAL = Counter(
+    'mcp_tool_calls_total',
+    'Total tool calls',
+    ['server_name', 'tool_name', 'status']
+)
+
+MCP_TOOL_CALL_DURATION = Histogram(
+    'mcp_tool_call_duration_seconds',
+    'Tool call duration in seconds',
+    ['server_name', 'tool_name'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+
+# OpenAI指标
+MCP_OPENAI_REQUESTS = Counter(
+    'mcp_openai_requests_total',
+    'Total OpenAI API requests',
+    ['model', 'status']
+)
+
+MCP_OPENAI_TOKENS = Counter(
+    'mcp_openai_tokens_total',
+    'Total OpenAI tokens used',
+    ['model', 'type']  # prompt_tokens, completion_tokens
+)
+
+# 错误指标
+MCP_ERRORS_TOTAL = Counter(
+    'mcp_errors_total',
+    'Total errors',
+    ['error_type', 'component']
+)
+
+# 系统指标
+MCP_CONCURRENT_REQUESTS = Gauge(
+    'mcp_concurrent_requests',
+    'Current number of concurrent requests'
+)
+
+# 应用信息
+MCP_APP_INFO = Info(
+    'mcp_app_info',
+    'Application information'
+)
+
+# 应用信息载荷固定不变，模块级常量 + 一次性写入标志：
+# 重复实例化收集器不会再重建字典、重触注册表更新
+_APP_INFO = {
+    'version': '0.2.0',
+    'name': 'MCP Production Client',
+    'description': 'Production-ready MCP multi-server client'
+}
+_info_set = False
+
+
+def make_inc(counter, **labels) -> Callable[..., None]:
+    """把标签组合特化成直接可调的inc
+
+    注册时解析一次labels()，之后每次打点只剩一个绑定方法调用，
+    既无标签字典构造也无子对象查找。
+    """
+    return counter.labels(**labels).inc
+
+
+class _Timer:
+    """轻量计时上下文：直接观测到预解析好标签的直方图子对象
+
+    手写__enter__/__exit__避开contextlib每次调用创建的
+    _GeneratorContextManager及其生成器协议开销；计时用
+    perf_counter_ns：单调整数时间戳，无系统时钟回拨造成的
+    负时长，也省掉浮点减法的舍入。
+    """
+
+    __slots__ = ('_hist', '_t')
+
+    def __init__(self, hist):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe((time.perf_counter_ns() - self._t) * 1e-9)
+
 
-@dataclass
 class MetricsCollector:
-    """指标收集器"""
-    
-    # 请求指标
-    requests_total: Counter = field(
-        default_factory=lambda: Counter(
-            'mcp_requests_total',
-            'Total number of requests',
-            ['method', 'endpoint', 'status', 'user_id']
-        )
-    )
-    
-    request_duration: Histogram = field(
-        default_factory=lambda: Histogram(
-            'mcp_request_duration_seconds',
-            'Request duration in seconds',
-            ['method', 'endpoint']
-        )
-    )
-    
-    # 连接池指标
-    connection_pool_size: Gauge = field(
-        default_factory=lambda: Gauge(
-            'mcp_connection_pool_size',
-            'Current connection pool size',
-            ['server_name']
-        )
-    )
-    
-    active_connections: Gauge = field(
-        default_factory=lambda: Gauge(
-            'mcp_active_connections',
-            'Number of active connections',
-            ['server_name']
-        )
-    )
-    
-    connection_errors: Counter = field(
-        default_factory=lambda: Counter(
-            'mcp_connection_errors_total',
-            'Total connection errors',
-            ['server_name', 'error_type']
-        )
-    )
-    
-    # 工具调用指标
-    tool_calls_total: Counter = field(
-        default_factory=lambda: Counter(
-            'mcp_tool_calls_total',
-            'Total tool calls',
-            ['server_name', 'tool_name', 'status']
-        )
-    )
-    
-    tool_call_duration: Histogram = field(
-        default_factory=lambda: Histogram(
-            'mcp_tool_call_duration_seconds',
-            'Tool call duration in seconds',
-            ['server_name', 'tool_name']
-        )
-    )
-    
-    # OpenAI指标
-    openai_requests: Counter = field(
-        default_factory=lambda: Counter(
-            'mcp_openai_requests_total',
-            'Total OpenAI API requests',
-            ['model', 'status']
-        )
-    )
-    
-    openai_tokens: Counter = field(
-        default_factory=lambda: Counter(
-            'mcp_openai_tokens_total',
-            'Total OpenAI tokens used',
-            ['model', 'type']  # prompt_tokens, completion_tokens
-        )
-    )
-    
-    # 错误指标
-    errors_total: Counter = field(
-        default_factory=lambda: Counter(
-            'mcp_errors_total',
-            'Total errors',
-            ['error_type', 'component']
-        )
-    )
-    
-    # 系统指标
-    concurrent_requests: Gauge = field(
-        default_factory=lambda: Gauge(
-            'mcp_concurrent_requests',
-            'Current number of concurrent requests'
-        )
-    )
-    
-    # 应用信息
-    app_info: Info = field(
-        default_factory=lambda: Info(
-            'mcp_app_info',
-            'Application information'
-        )
-    )
-    
-    def __post_init__(self):
-        """初始化后设置应用信息"""
-        self.app_info.info({
-            'version': '0.2.0',
-            'name': 'MCP Production Client',
-            'description': 'Production-ready MCP multi-server client'
-        })
-    
-    @contextmanager
-    def time_request(self, method: str, endpoint: str):
+    """指标收集器
+
+    指标本身是上面的模块级常量，类属性只是引用，实例里
+    只保留标签子对象缓存等可变状态。
+    """
+
+    requests_total = MCP_REQUESTS_TOTAL
+    request_duration = MCP_REQUEST_DURATION
+    connection_pool_size = MCP_CONNECTION_POOL_SIZE
+    active_connections = MCP_ACTIVE_CONNECTIONS
+    connection_errors = MCP_CONNECTION_ERRORS
+    tool_calls_total = MCP_TOOL_CALLS_TOTAL
+    tool_call_duration = MCP_TOOL_CALL_DURATION
+    openai_requests = MCP_OPENAI_REQUESTS
+    openai_tokens = MCP_OPENAI_TOKENS
+    errors_total = MCP_ERRORS_TOTAL
+    concurrent_requests = MCP_CONCURRENT_REQUESTS
+    app_info = MCP_APP_INFO
+
+    def __init__(self):
+        # 标签子对象缓存：prometheus_client每次labels()都要构造标签元组、
+        # 加锁并查内部字典，已知组合直接从本地缓存取子对象
+        self._label_cache: Dict[tuple, Any] = {}
+
+        # token计数器按模型单独缓存：OpenAI路径每次请求最多打三个点，
+        # 模型名直接作键省掉组合键元组的构造
+        self._prompt_tok_children: Dict[str, Any] = {}
+        self._completion_tok_children: Dict[str, Any] = {}
+
+        # 工具调用打点的特化分发表：(server, tool, status) -> 绑定inc；
+        # 服务器/工具组合有限，表在首次出现时惰性填充
+        self._tool_inc_table: Dict[tuple, Callable[..., None]] = {}
+
+        global _info_set
+        if not _info_set:
+            self.app_info.info(_APP_INFO)
+            _info_set = True
+
+    def _lbl(self, metric, *labels):
+        """按(指标, 标签值)取缓存的标签子对象"""
+        key = (id(metric),) + labels
+        child = self._label_cache.get(key)
+        if child is None:
+            child = metric.labels(*labels)
+            self._label_cache[key] = child
+        return child
+
+    def time_request(self, method: str, endpoint: str) -> _Timer:
         """计时请求执行时间"""
-        start_time = time.time()
-        try:
-            yield
-        finally:
-            duration = time.time() - start_time
-            self.request_duration.labels(method=method, endpoint=endpoint).observe(duration)
-    
-    @contextmanager
-    def time_tool_call(self, server_name: str, tool_name: str):
+        return _Timer(self._lbl(self.request_duration, method, endpoint))
+
+    def time_tool_call(self, server_name: str, tool_name: str) -> _Timer:
         """计时工具调用执行时间"""
-        start_time = time.time()
-        try:
-            yield
-        finally:
-            duration = time.time() - start_time
-            self.tool_call_duration.labels(
-                server_name=server_name,
-                tool_name=tool_name
-            ).observe(duration)
-    
+        return _Timer(self._lbl(self.tool_call_duration, server_name, tool_name))
+
     def record_request(self, method: str, endpoint: str, status: str, user_id: str = None):
-        """记录请求"""
-        self.requests_total.labels(
-            method=method,
-            endpoint=endpoint,
-            status=status,
-            user_id=user_id or 'anonymous'
-        ).inc()
-    
+        """记录请求
+
+        user_id参数保留以兼容调用方，但不再作为指标标签；
+        用户维度的行为分析走日志而非Prometheus时间序列。
+        """
+        self._lbl(self.requests_total, method, endpoint, status).inc()
+
     def record_tool_call(self, server_name: str, tool_name: str, status: str):
         """记录工具调用"""
-        self.tool_calls_total.labels(
-            server_name=server_name,
-            tool_name=tool_name,
-            status=status
-        ).inc()
-    
+        key = (server_name, tool_name, status)
+        inc = self._tool_inc_table.get(key)
+        if inc is None:
+            inc = make_inc(
+                self.tool_calls_total,
+                server_name=server_name,
+                tool_name=tool_name,
+                status=status
+            )
+            self._tool_inc_table[key] = inc
+        inc()
+
     def record_connection_error(self, server_name: str, error_type: str):
         """记录连接错误"""
-        self.connection_errors.labels(
-            server_name=server_name,
-            error_type=error_type
-        ).inc()
-    
+        self._lbl(self.connection_errors, server_name, error_type).inc()
+
     def record_openai_request(self, model: str, status: str, prompt_tokens: int = 0, completion_tokens: int = 0):
         """记录OpenAI请求"""
-        self.openai_requests.labels(model=model, status=status).inc()
-        
+        self._lbl(self.openai_requests, model, status).inc()
+
         if prompt_tokens > 0:
-            self.openai_tokens.labels(model=model, type='prompt').inc(prompt_tokens)
+            child = self._prompt_tok_children.get(model)
+            if child is None:
+                child = self.openai_tokens.labels(model=model, type='prompt')
+                self._prompt_tok_children[model] = child
+            child.inc(prompt_tokens)
         if completion_tokens > 0:
-            self.openai_tokens.labels(model=model, type='completion').inc(completion_tokens)
-    
-    def record_error(self, error_type: str, component: str):
+            child = self._completion_tok_children.get(model)
+            if child is None:
+                child = self.openai_tokens.labels(model=model, type='completion')
+                self._completion_tok_children[model] = child
+            child.inc(completion_tokens)
+
+    def record_error(self, error_type: str, component: str, count: int = 1):
         """记录错误"""
-        self.errors_total.labels(error_type=error_type, component=component).inc()
-    
+        self._lbl(self.errors_total, error_type, component).inc(count)
+
     def update_connection_pool_metrics(self, server_name: str, pool_size: int, active_count: int):
         """更新连接池指标"""
-        self.connection_pool_size.labels(server_name=server_name).set(pool_size)
-        self.active_connections.labels(server_name=server_name).set(active_count)
+        self._lbl(self.connection_pool_size, server_name).set(pool_size)
+        self._lbl(self.active_connections, server_name).set(active_count)
     
     def set_concurrent_requests(self, count: int):
         """设置并发请求数"""
@@ -199,7 +257,12 @@ metrics = MetricsCollector()
 
 class PerformanceMonitor:
     """性能监控器"""
-    
+
+    __slots__ = (
+        'stats', '_stats_view', '_request_times', '_window_idx', '_window_len',
+        '_running_sum', '_request_count', '_error_count', '_last_reset'
+    )
+
     def __init__(self):
         self.stats = {
             'requests_per_second': 0.0,
@@ -207,34 +270,46 @@ class PerformanceMonitor:
             'error_rate': 0.0,
             'connection_pool_utilization': 0.0
         }
-        self._request_times = []
+        # 只读视图随stats实时更新，get_stats不再每次复制字典
+        self._stats_view = MappingProxyType(self.stats)
+        # 最近100个请求的预分配环形数组 + 增量和：记录和求均值都是
+        # O(1)，写入是C层的标量存储，无每元素Python对象装箱
+        self._request_times = np.empty(100, dtype=np.float64)
+        self._window_idx = 0
+        self._window_len = 0
+        self._running_sum = 0.0
         self._request_count = 0
         self._error_count = 0
-        self._last_reset = time.time()
-    
+        # 窗口计时用单调纳秒时间戳，NTP校时不会产生负窗口
+        self._last_reset = time.perf_counter_ns()
+
     def record_request(self, duration: float, error: bool = False):
         """记录请求性能数据"""
-        self._request_times.append(duration)
+        arr = self._request_times
+        if self._window_len == arr.shape[0]:
+            # 窗口已满：覆盖最旧条目，先从增量和里扣掉
+            self._running_sum -= arr[self._window_idx]
+        else:
+            self._window_len += 1
+        arr[self._window_idx] = duration
+        self._window_idx = (self._window_idx + 1) % arr.shape[0]
+        self._running_sum += duration
         self._request_count += 1
         if error:
             self._error_count += 1
-        
-        # 保持最近100个请求的数据
-        if len(self._request_times) > 100:
-            self._request_times.pop(0)
-        
+
         self._update_stats()
     
     def _update_stats(self):
         """更新统计数据"""
-        now = time.time()
-        time_window = now - self._last_reset
+        now = time.perf_counter_ns()
+        time_window = (now - self._last_reset) * 1e-9
         
         if time_window > 0:
             self.stats['requests_per_second'] = self._request_count / time_window
         
-        if self._request_times:
-            self.stats['avg_response_time'] = sum(self._request_times) / len(self._request_times)
+        if self._window_len:
+            self.stats['avg_response_time'] = self._running_sum / self._window_len
         
         if self._request_count > 0:
             self.stats['error_rate'] = self._error_count / self._request_count
@@ -247,11 +322,11 @@ class PerformanceMonitor:
         """重置统计数据"""
         self._request_count = 0
         self._error_count = 0
-        self._last_reset = time.time()
+        self._last_reset = time.perf_counter_ns()
     
-    def get_stats(self) -> Dict[str, Any]:
-        """获取性能统计"""
-        return self.stats.copy()
+    def get_stats(self) -> Mapping[str, Any]:
+        """获取性能统计（只读视图，零拷贝）"""
+        return self._stats_view
 
 
 # 全局性能监控器实例
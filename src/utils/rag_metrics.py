@@ -11,22 +11,24 @@ RAG_CHUNKS_EMBEDDED = Gauge('rag_chunks_embedded', 'Number of embedded chunks')
 
 # RAG搜索相关指标
 RAG_SEARCH_REQUESTS_TOTAL = Counter('rag_search_requests_total', 'Total search requests', ['search_type', 'status'])
-RAG_SEARCH_DURATION = Histogram('rag_search_duration_seconds', 'Search request duration', ['search_type'])
-RAG_SEARCH_RESULTS_COUNT = Histogram('rag_search_results_count', 'Number of search results returned', ['search_type'])
+# 显式桶边界：裁掉与各自耗时区间无关的默认桶，缩小/metrics导出量
+RAG_SEARCH_DURATION = Histogram('rag_search_duration_seconds', 'Search request duration', ['search_type'], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5))
+# 结果条数是离散小整数，4个粗桶足以看分布，observe的桶循环也短
+RAG_SEARCH_RESULTS_COUNT = Histogram('rag_search_results_count', 'Number of search results returned', ['search_type'], buckets=(1, 5, 10, 50))
 
 # RAG嵌入相关指标
 RAG_EMBEDDING_REQUESTS_TOTAL = Counter('rag_embedding_requests_total', 'Total embedding requests', ['status'])
-RAG_EMBEDDING_DURATION = Histogram('rag_embedding_duration_seconds', 'Embedding creation duration')
+RAG_EMBEDDING_DURATION = Histogram('rag_embedding_duration_seconds', 'Embedding creation duration', buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
 RAG_EMBEDDING_TOKENS_TOTAL = Counter('rag_embedding_tokens_total', 'Total tokens processed for embeddings')
 
 # RAG文档处理指标
 RAG_DOCUMENT_PROCESSING_TOTAL = Counter('rag_document_processing_total', 'Total document processing requests', ['status'])
-RAG_DOCUMENT_PROCESSING_DURATION = Histogram('rag_document_processing_duration_seconds', 'Document processing duration')
+RAG_DOCUMENT_PROCESSING_DURATION = Histogram('rag_document_processing_duration_seconds', 'Document processing duration', buckets=(0.1, 0.5, 1, 5, 10, 30, 60))
 RAG_DOCUMENT_SIZE_BYTES = Histogram('rag_document_size_bytes', 'Document size in bytes', buckets=[1024, 10240, 102400, 1048576, 10485760])
 
 # RAG数据库相关指标
 RAG_DB_CONNECTIONS_ACTIVE = Gauge('rag_db_connections_active', 'Active database connections')
-RAG_DB_QUERY_DURATION = Histogram('rag_db_query_duration_seconds', 'Database query duration', ['operation'])
+RAG_DB_QUERY_DURATION = Histogram('rag_db_query_duration_seconds', 'Database query duration', ['operation'], buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
 RAG_DB_OPERATIONS_TOTAL = Counter('rag_db_operations_total', 'Total database operations', ['operation', 'status'])
 
 # RAG缓存指标
@@ -40,113 +42,155 @@ RAG_ERRORS_TOTAL = Counter('rag_errors_total', 'Total RAG errors', ['service', '
 
 class RAGMetricsCollector:
     """RAG指标收集器"""
-    
+
+    __slots__ = (
+        '_search_start_times', '_processing_start_times', '_label_cache',
+        '_doc_total', '_doc_indexed', '_chunks_total', '_chunks_embedded',
+        '_search_dur', '_search_req', '_search_results', '_errors',
+        '_proc_dur', '_proc_total', '_doc_size',
+        '_embed_req', '_embed_dur', '_embed_tokens',
+        '_db_query_dur', '_db_ops', '_db_conns',
+        '_cache_hits', '_cache_misses', '_cache_size'
+    )
+
     def __init__(self):
         self._search_start_times = {}
         self._processing_start_times = {}
-    
+        # 标签子对象缓存：已知标签组合跳过prometheus_client内部的
+        # 元组哈希、加锁和字典探测
+        self._label_cache = {}
+        # 指标句柄统一预绑定到实例：热路径方法里LOAD_FAST+LOAD_ATTR
+        # 取代LOAD_GLOBAL的模块字典查找
+        self._doc_total = RAG_DOCUMENTS_TOTAL
+        self._doc_indexed = RAG_DOCUMENTS_INDEXED
+        self._chunks_total = RAG_CHUNKS_TOTAL
+        self._chunks_embedded = RAG_CHUNKS_EMBEDDED
+        self._search_dur = RAG_SEARCH_DURATION
+        self._search_req = RAG_SEARCH_REQUESTS_TOTAL
+        self._search_results = RAG_SEARCH_RESULTS_COUNT
+        self._errors = RAG_ERRORS_TOTAL
+        self._proc_dur = RAG_DOCUMENT_PROCESSING_DURATION
+        self._proc_total = RAG_DOCUMENT_PROCESSING_TOTAL
+        self._doc_size = RAG_DOCUMENT_SIZE_BYTES
+        self._embed_req = RAG_EMBEDDING_REQUESTS_TOTAL
+        self._embed_dur = RAG_EMBEDDING_DURATION
+        self._embed_tokens = RAG_EMBEDDING_TOKENS_TOTAL
+        self._db_query_dur = RAG_DB_QUERY_DURATION
+        self._db_ops = RAG_DB_OPERATIONS_TOTAL
+        self._db_conns = RAG_DB_CONNECTIONS_ACTIVE
+        self._cache_hits = RAG_CACHE_HITS_TOTAL
+        self._cache_misses = RAG_CACHE_MISSES_TOTAL
+        self._cache_size = RAG_CACHE_SIZE
+
+    def _lbl(self, metric, *labels):
+        """按(指标, 标签值)取缓存的标签子对象"""
+        key = (id(metric),) + labels
+        child = self._label_cache.get(key)
+        if child is None:
+            child = metric.labels(*labels)
+            self._label_cache[key] = child
+        return child
+
     def record_search_start(self, request_id: str, search_type: str) -> None:
         """记录搜索开始"""
         self._search_start_times[request_id] = {
-            'start_time': time.time(),
+            'start_time': time.perf_counter_ns(),
             'search_type': search_type
         }
     
     def record_search_complete(self, request_id: str, results_count: int, success: bool = True) -> None:
         """记录搜索完成"""
-        if request_id not in self._search_start_times:
+        # pop带默认值：存在性检查和取出合并为一次哈希探测
+        start_info = self._search_start_times.pop(request_id, None)
+        if start_info is None:
             return
-        
-        start_info = self._search_start_times.pop(request_id)
-        duration = time.time() - start_info['start_time']
+
+        duration = (time.perf_counter_ns() - start_info['start_time']) * 1e-9
         search_type = start_info['search_type']
         
         # 记录指标
-        RAG_SEARCH_DURATION.labels(search_type=search_type).observe(duration)
-        RAG_SEARCH_REQUESTS_TOTAL.labels(
-            search_type=search_type, 
-            status='success' if success else 'error'
-        ).inc()
-        RAG_SEARCH_RESULTS_COUNT.labels(search_type=search_type).observe(results_count)
+        self._lbl(self._search_dur, search_type).observe(duration)
+        self._lbl(self._search_req, search_type,
+                  'success' if success else 'error').inc()
+        self._lbl(self._search_results, search_type).observe(results_count)
     
     def record_search_error(self, request_id: str, error_type: str) -> None:
         """记录搜索错误"""
-        if request_id in self._search_start_times:
-            start_info = self._search_start_times.pop(request_id)
-            search_type = start_info['search_type']
-            RAG_SEARCH_REQUESTS_TOTAL.labels(search_type=search_type, status='error').inc()
+        start_info = self._search_start_times.pop(request_id, None)
+        if start_info is not None:
+            self._lbl(self._search_req, start_info['search_type'], 'error').inc()
         
-        RAG_ERRORS_TOTAL.labels(service='search', error_type=error_type).inc()
+        self._lbl(self._errors, 'search', error_type).inc()
     
     def record_document_processing_start(self, document_id: int) -> None:
         """记录文档处理开始"""
-        self._processing_start_times[document_id] = time.time()
+        self._processing_start_times[document_id] = time.perf_counter_ns()
     
     def record_document_processing_complete(self, document_id: int, success: bool = True) -> None:
         """记录文档处理完成"""
-        if document_id not in self._processing_start_times:
+        start_time = self._processing_start_times.pop(document_id, None)
+        if start_time is None:
             return
+
+        duration = (time.perf_counter_ns() - start_time) * 1e-9
         
-        start_time = self._processing_start_times.pop(document_id)
-        duration = time.time() - start_time
-        
-        RAG_DOCUMENT_PROCESSING_DURATION.observe(duration)
-        RAG_DOCUMENT_PROCESSING_TOTAL.labels(
-            status='success' if success else 'error'
-        ).inc()
+        self._proc_dur.observe(duration)
+        self._lbl(self._proc_total,
+                  'success' if success else 'error').inc()
     
     def record_document_size(self, size_bytes: int) -> None:
         """记录文档大小"""
-        RAG_DOCUMENT_SIZE_BYTES.observe(size_bytes)
+        self._doc_size.observe(size_bytes)
     
     def record_embedding_request(self, token_count: int, duration: float, success: bool = True) -> None:
         """记录嵌入请求"""
-        RAG_EMBEDDING_REQUESTS_TOTAL.labels(
-            status='success' if success else 'error'
-        ).inc()
-        RAG_EMBEDDING_DURATION.observe(duration)
+        self._lbl(self._embed_req,
+                  'success' if success else 'error').inc()
+        self._embed_dur.observe(duration)
         if success:
-            RAG_EMBEDDING_TOKENS_TOTAL.inc(token_count)
+            self._embed_tokens.inc(token_count)
     
     def record_db_operation(self, operation: str, duration: float, success: bool = True) -> None:
         """记录数据库操作"""
-        RAG_DB_QUERY_DURATION.labels(operation=operation).observe(duration)
-        RAG_DB_OPERATIONS_TOTAL.labels(
-            operation=operation,
-            status='success' if success else 'error'
-        ).inc()
+        self._lbl(self._db_query_dur, operation).observe(duration)
+        self._lbl(self._db_ops, operation,
+                  'success' if success else 'error').inc()
     
     def record_cache_hit(self, cache_type: str) -> None:
         """记录缓存命中"""
-        RAG_CACHE_HITS_TOTAL.labels(cache_type=cache_type).inc()
+        self._lbl(self._cache_hits, cache_type).inc()
     
     def record_cache_miss(self, cache_type: str) -> None:
         """记录缓存未命中"""
-        RAG_CACHE_MISSES_TOTAL.labels(cache_type=cache_type).inc()
+        self._lbl(self._cache_misses, cache_type).inc()
     
     def update_document_stats(self, stats: Dict[str, Any]) -> None:
-        """更新文档统计"""
+        """更新文档统计
+
+        stats形状由document_service产出、固定可控：外层键做存在性
+        守卫，内层直接下标——缺键是编程错误，宁可炸响也不静默归零。
+        """
         if 'documents' in stats:
             doc_stats = stats['documents']
-            RAG_DOCUMENTS_TOTAL.set(doc_stats.get('total', 0))
-            RAG_DOCUMENTS_INDEXED.set(doc_stats.get('indexed', 0))
-        
+            self._doc_total.set(doc_stats['total'])
+            self._doc_indexed.set(doc_stats['indexed'])
+
         if 'chunks' in stats:
             chunk_stats = stats['chunks']
-            RAG_CHUNKS_TOTAL.set(chunk_stats.get('total', 0))
-            RAG_CHUNKS_EMBEDDED.set(chunk_stats.get('embedded', 0))
+            self._chunks_total.set(chunk_stats['total'])
+            self._chunks_embedded.set(chunk_stats['embedded'])
     
     def update_db_connections(self, active_connections: int) -> None:
         """更新数据库连接数"""
-        RAG_DB_CONNECTIONS_ACTIVE.set(active_connections)
+        self._db_conns.set(active_connections)
     
     def update_cache_size(self, cache_type: str, size: int) -> None:
         """更新缓存大小"""
-        RAG_CACHE_SIZE.labels(cache_type=cache_type).set(size)
+        self._lbl(self._cache_size, cache_type).set(size)
     
     def record_error(self, service: str, error_type: str) -> None:
         """记录错误"""
-        RAG_ERRORS_TOTAL.labels(service=service, error_type=error_type).inc()
+        self._lbl(self._errors, service, error_type).inc()
 
 
 # 全局指标收集器实例
@@ -2,81 +2,98 @@
 """生产环境测试脚本"""
 
 import asyncio
-import json
 import time
 from typing import Dict, Any
 
 import httpx
+import orjson
 
 
-async def test_api_endpoints():
+BASE_URL = "http://localhost:8000"
+
+
+def create_client() -> httpx.AsyncClient:
+    """创建贯穿全部测试阶段的共享HTTP客户端
+
+    单客户端复用连接池：各阶段不再各自建池和TLS上下文，
+    性能测试的并发请求共享保活连接而非逐个握手。
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        timeout=30.0,
+    )
+
+
+async def test_api_endpoints(client: httpx.AsyncClient):
     """测试API端点"""
-    base_url = "http://localhost:8000"
+    base_url = BASE_URL
+
+    print("🧪 开始API测试...")
+
+    # 测试根端点
+    print("📍 测试根端点...")
+    response = await client.get(f"{base_url}/")
+    print(f"   状态码: {response.status_code}")
+    print(f"   响应: {orjson.loads(response.content)}")
     
-    async with httpx.AsyncClient() as client:
-        print("🧪 开始API测试...")
-        
-        # 测试根端点
-        print("📍 测试根端点...")
-        response = await client.get(f"{base_url}/")
-        print(f"   状态码: {response.status_code}")
-        print(f"   响应: {response.json()}")
-        
-        # 测试健康检查
-        print("\n🏥 测试健康检查...")
-        response = await client.get(f"{base_url}/health")
-        print(f"   状态码: {response.status_code}")
-        health_data = response.json()
-        print(f"   整体状态: {health_data.get('status', 'unknown')}")
-        
-        # 测试工具列表
-        print("\n🔧 测试工具列表...")
-        response = await client.get(f"{base_url}/tools")
-        print(f"   状态码: {response.status_code}")
-        if response.status_code == 200:
-            tools_data = response.json()
-            print(f"   工具数量: {tools_data.get('count', 0)}")
-            if tools_data.get('tools'):
-                for tool in tools_data['tools'][:3]:  # 显示前3个工具
-                    print(f"   - {tool.get('function', {}).get('name', 'unknown')}")
-        
-        # 测试服务器状态
-        print("\n📊 测试服务器状态...")
-        response = await client.get(f"{base_url}/status")
-        print(f"   状态码: {response.status_code}")
-        if response.status_code == 200:
-            status_data = response.json()
-            print(f"   服务器数量: {len(status_data.get('servers', []))}")
-            print(f"   并发请求: {status_data.get('concurrent_requests', 0)}")
-        
-        # 测试查询功能
-        print("\n💬 测试查询功能...")
-        query_data = {
-            "query": "计算 10 + 15",
-            "user_id": "test_user"
-        }
-        response = await client.post(f"{base_url}/query", json=query_data)
-        print(f"   状态码: {response.status_code}")
-        if response.status_code == 200:
-            query_result = response.json()
-            print(f"   响应内容: {query_result.get('content', '')[:100]}...")
-            print(f"   使用工具数: {len(query_result.get('tools_used', []))}")
-            print(f"   执行时间: {query_result.get('execution_time', 0):.2f}s")
-        
-        # 测试指标端点
-        print("\n📈 测试指标端点...")
-        response = await client.get(f"{base_url}/metrics")
+    # 测试健康检查
+    print("\n🏥 测试健康检查...")
+    response = await client.get(f"{base_url}/health")
+    print(f"   状态码: {response.status_code}")
+    health_data = orjson.loads(response.content)
+    print(f"   整体状态: {health_data.get('status', 'unknown')}")
+    
+    # 测试工具列表
+    print("\n🔧 测试工具列表...")
+    response = await client.get(f"{base_url}/tools")
+    print(f"   状态码: {response.status_code}")
+    if response.status_code == 200:
+        tools_data = orjson.loads(response.content)
+        print(f"   工具数量: {tools_data.get('count', 0)}")
+        if tools_data.get('tools'):
+            for tool in tools_data['tools'][:3]:  # 显示前3个工具
+                print(f"   - {tool.get('function', {}).get('name', 'unknown')}")
+    
+    # 测试服务器状态
+    print("\n📊 测试服务器状态...")
+    response = await client.get(f"{base_url}/status")
+    print(f"   状态码: {response.status_code}")
+    if response.status_code == 200:
+        status_data = orjson.loads(response.content)
+        print(f"   服务器数量: {len(status_data.get('servers', []))}")
+        print(f"   并发请求: {status_data.get('concurrent_requests', 0)}")
+    
+    # 测试查询功能
+    print("\n💬 测试查询功能...")
+    query_data = {
+        "query": "计算 10 + 15",
+        "user_id": "test_user"
+    }
+    response = await client.post(f"{base_url}/query", json=query_data)
+    print(f"   状态码: {response.status_code}")
+    if response.status_code == 200:
+        query_result = orjson.loads(response.content)
+        print(f"   响应内容: {query_result.get('content', '')[:100]}...")
+        print(f"   使用工具数: {len(query_result.get('tools_used', []))}")
+        print(f"   执行时间: {query_result.get('execution_time', 0):.2f}s")
+    
+    # 测试指标端点：流式逐块计数，不把整个exposition体
+    # 物化成Python字符串（生产规模下可达数MB）
+    print("\n📈 测试指标端点...")
+    async with client.stream("GET", f"{base_url}/metrics") as response:
         print(f"   状态码: {response.status_code}")
         if response.status_code == 200:
-            metrics_text = response.text
-            print(f"   指标数据长度: {len(metrics_text)} 字符")
+            total_bytes = 0
+            async for chunk in response.aiter_raw():
+                total_bytes += len(chunk)
+            print(f"   指标数据长度: {total_bytes} 字节")
 
 
-async def performance_test():
+async def performance_test(client: httpx.AsyncClient):
     """性能测试"""
     print("\n🚀 开始性能测试...")
-    
-    base_url = "http://localhost:8000"
+
+    base_url = BASE_URL
     concurrent_requests = 10
     
     async def single_request(client: httpx.AsyncClient, request_id: int):
@@ -108,32 +125,45 @@ async def performance_test():
                 "error": str(e)
             }
     
-    async with httpx.AsyncClient() as client:
-        # 并发发送请求
-        tasks = [
-            single_request(client, i) 
-            for i in range(concurrent_requests)
-        ]
-        
-        start_time = time.time()
-        results = await asyncio.gather(*tasks)
-        total_time = time.time() - start_time
-        
-        # 分析结果
-        successful_requests = [r for r in results if r["success"]]
-        failed_requests = [r for r in results if not r["success"]]
-        
-        print(f"   总请求数: {len(results)}")
-        print(f"   成功请求数: {len(successful_requests)}")
-        print(f"   失败请求数: {len(failed_requests)}")
-        print(f"   总耗时: {total_time:.2f}s")
-        print(f"   平均响应时间: {sum(r['duration'] for r in successful_requests) / len(successful_requests):.2f}s" if successful_requests else "N/A")
-        print(f"   请求/秒: {len(results) / total_time:.2f}")
-        
-        if failed_requests:
-            print("\n❌ 失败请求详情:")
-            for req in failed_requests[:3]:  # 只显示前3个
-                print(f"   请求 {req['request_id']}: {req.get('error', '未知错误')}")
+    # 并发发送请求（复用共享客户端的连接池）
+    tasks = [
+        single_request(client, i)
+        for i in range(concurrent_requests)
+    ]
+
+    # 按完成顺序就地累加，不保留全量结果列表；
+    # 失败详情只留前3条
+    n_ok = 0
+    n_fail = 0
+    ok_duration_sum = 0.0
+    first_errors = []
+
+    start_time = time.time()
+    for coro in asyncio.as_completed(tasks):
+        result = await coro
+        if result["success"]:
+            n_ok += 1
+            ok_duration_sum += result["duration"]
+        else:
+            n_fail += 1
+            if len(first_errors) < 3:
+                first_errors.append(
+                    f"   请求 {result['request_id']}: {result.get('error', '未知错误')}"
+                )
+    total_time = time.time() - start_time
+
+    total = n_ok + n_fail
+    print(f"   总请求数: {total}")
+    print(f"   成功请求数: {n_ok}")
+    print(f"   失败请求数: {n_fail}")
+    print(f"   总耗时: {total_time:.2f}s")
+    print(f"   平均响应时间: {ok_duration_sum / n_ok:.2f}s" if n_ok else "N/A")
+    print(f"   请求/秒: {total / total_time:.2f}")
+
+    if first_errors:
+        print("\n❌ 失败请求详情:")
+        for line in first_errors:
+            print(line)
 
 
 async def main():
@@ -142,12 +172,13 @@ async def main():
     print("=" * 50)
     
     try:
-        # 基础API测试
-        await test_api_endpoints()
-        
-        # 性能测试
-        await performance_test()
-        
+        async with create_client() as client:
+            # 基础API测试
+            await test_api_endpoints(client)
+
+            # 性能测试
+            await performance_test(client)
+
         print("\n✅ 测试完成!")
         
     except Exception as e: